@@ -0,0 +1,126 @@
+import time
+from fastapi import Depends, Form, HTTPException, Request, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from app import crud
+from app.api.permissions import permission_registry
+from app.core.config import settings
+from app.core.db import get_db, read_session
+from app.core.metrics import rate_limited
+from app.core.rate_limit import rate_limiter, retry_after
+from app.core.security import decode_access_token
+from app.core.token_store import REFRESH_TOKEN_TYPE, revocation_checker
+from app.core.user_cache import CachedUser
+
+
+async def get_current_user(request: Request):
+    # Извлекаем токен из куки
+    token = request.cookies.get("access_token")
+    if not token:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token not found in cookies",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    # Декодируем токен
+    payload = decode_access_token(token)
+    # Refresh-токен не заменяет access-токен; отзыв проверяется по фильтру в памяти.
+    # Токен без jti отозвать нельзя, поэтому он не принимается (такие выданы до отзыва
+    # и истекают через ACCESS_TOKEN_EXPIRE_MINUTES)
+    if (
+        payload is None
+        or payload.get("type") == REFRESH_TOKEN_TYPE
+        or "jti" not in payload
+        or await revocation_checker.is_revoked(payload["jti"])
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return payload
+
+
+# Кука с моментом, до которого клиент читает из основной БД (read-your-writes)
+READ_PRIMARY_COOKIE = "read_primary_until"
+
+
+def reads_from_primary(request: Request) -> bool:
+    try:
+        return float(request.cookies.get(READ_PRIMARY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def mark_primary_reads(response: Response) -> None:
+    """После изменения данных клиент READ_YOUR_WRITES_SECONDS читает из основной БД, а не с реплики."""
+    if settings.replica_database_urls:
+        response.set_cookie(
+            READ_PRIMARY_COOKIE,
+            str(int(time.time()) + settings.READ_YOUR_WRITES_SECONDS),
+            max_age=settings.READ_YOUR_WRITES_SECONDS,
+            httponly=True,
+        )
+
+
+# Для эндпоинтов, изменяющих данные; кука попадает в ответ только при успехе
+async def read_your_writes(response: Response) -> None:
+    mark_primary_reads(response)
+
+
+# Сессия для эндпоинтов только на чтение: реплика или, сразу после изменений клиента, основная БД
+async def get_read_db(request: Request):
+    async with read_session(reads_from_primary(request)) as db:
+        yield db
+
+
+# Текущий пользователь из БД; FastAPI вызывает зависимость один раз за запрос
+async def get_current_db_user(
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db),
+) -> CachedUser:
+    user = await crud.get_cached_user(db, current_user["sub"])
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    return user
+
+
+# Проверка права роли текущего пользователя по карте прав в памяти
+def require_permission(permission: str):
+    async def checker(
+        user: CachedUser = Depends(get_current_db_user),
+        db: AsyncSession = Depends(get_db),
+    ) -> CachedUser:
+        if permission_registry.needs_refresh():
+            await permission_registry.ensure_loaded(db)
+        if permission not in permission_registry.permissions_for(user.role):
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not enough permissions")
+        return user
+
+    return checker
+
+
+# Адрес клиента; за прокси берётся из X-Forwarded-For (uvicorn --proxy-headers)
+def client_ip(request: Request) -> str:
+    return request.client.host if request.client else "unknown"
+
+
+# Ограничение частоты по IP и имени пользователя; срабатывает до запросов к БД и bcrypt
+def rate_limit(scope: str, ip_limit: int, username_limit: int):
+    async def checker(request: Request, username: str = Form(...)) -> None:
+        if not settings.RATE_LIMIT_ENABLED:
+            return
+        ip = client_ip(request)
+        for key, limit in (
+            (f"{scope}:ip:{ip}", ip_limit),
+            (f"{scope}:user:{username.lower()}", username_limit),
+        ):
+            wait = await rate_limiter.hit(key, limit, settings.RATE_LIMIT_WINDOW_SECONDS)
+            if wait:
+                rate_limited.labels(scope).inc()
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail="Too many requests, try again later",
+                    headers={"Retry-After": retry_after(wait)},
+                )
+
+    return checker
@@ -1,54 +1,66 @@
+from functools import lru_cache
 from app.core.config import settings
-from authlib.integrations.starlette_client import OAuth
-from starlette.config import Config
 from starlette.requests import Request
-from datetime import timedelta
-from app.api.models import User, Role
+from app.api.models import User
 from fastapi import APIRouter, Depends, HTTPException
 from starlette.responses import RedirectResponse
-from sqlalchemy.orm import Session
-from app.core.db import SessionLocal
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.db import get_db
 from app.core.security import create_access_token
+from app.core.token_store import issue_refresh_token
+from app.core.metrics import google_oauth_duration
+from app.core.oidc import ProviderMetadataCache
+from app import crud
+from app.api.permissions import DEFAULT_ROLE, permission_registry
+from app.api.deps import client_ip, mark_primary_reads
+from app import audit
+from app.audit import audit_log
+
+# Все маршруты входа через Google; только для них включена сессия (state/nonce authlib)
+OAUTH_PATH_PREFIX = "/auth/google"
+
+
+# Клиент Google OAuth2 создаётся при первом обращении (в lifespan), а не при импорте.
+# Секреты берутся из settings: .env читается один раз.
+@lru_cache
+def get_google_client():
+    from authlib.integrations.starlette_client import OAuth
+
+    oauth = OAuth()
+    oauth.register(
+        name="google",
+        client_id=settings.GOOGLE_CLIENT_ID,
+        client_secret=settings.GOOGLE_CLIENT_SECRET,
+        server_metadata_url=settings.GOOGLE_DISCOVERY_URL,
+        client_kwargs={"scope": "openid email profile"},
+    )
+    return oauth.google
+
+
+# Discovery-документ и JWKS Google в памяти, обновляются в фоне
+def create_google_metadata_cache() -> ProviderMetadataCache:
+    return ProviderMetadataCache(
+        get_google_client(), ttl=settings.OIDC_METADATA_TTL_SECONDS, timeout=settings.OIDC_FETCH_TIMEOUT_SECONDS,
+    )
 
 
-# Настройки приложения
-config = Config(".env")  # Храните секреты в .env файле
-oauth = OAuth(config)
-
-
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
-# Конфигурация Google OAuth2
-oauth.register(
-    name="google",
-    client_id=settings.GOOGLE_CLIENT_ID,
-    client_secret=settings.GOOGLE_CLIENT_SECRET,
-    server_metadata_url="https://accounts.google.com/.well-known/openid-configuration",
-    client_kwargs={"scope": "openid email profile"},
-)
-
 router = APIRouter()
 
 
 # Маршрут для начала авторизации
-@router.get("/auth/google")
+@router.get(OAUTH_PATH_PREFIX)
 async def google_login(request: Request):
     redirect_uri = request.url_for("google_auth_callback")  # Callback URI
-    return await oauth.google.authorize_redirect(request, redirect_uri)
+    return await get_google_client().authorize_redirect(request, redirect_uri)
 
 
 # Маршрут для обработки ответа от Google
-@router.get("/auth/google/callback")
-async def google_auth_callback(request: Request, db: Session = Depends(get_db)):
+@router.get(f"{OAUTH_PATH_PREFIX}/callback")
+async def google_auth_callback(request: Request, ip: str = Depends(client_ip), db: AsyncSession = Depends(get_db)):
     try:
         # Получение токена от Google
-        token = await oauth.google.authorize_access_token(request)
+        with google_oauth_duration.time():
+            token = await get_google_client().authorize_access_token(request)
         user_info = token.get("userinfo")  # Получение информации о пользователе
 
         if not user_info:
@@ -59,37 +71,38 @@ async def google_auth_callback(request: Request, db: Session = Depends(get_db)):
         user_name = user_info.get("name", "Google User")
 
         # Проверка, существует ли пользователь
-        user = db.query(User).filter(User.email == user_email).first()
+        user = await crud.get_user_by_email(db, user_email)
 
         if not user:
-            # Создание новой роли, если она отсутствует
-            default_role = db.query(Role).filter(Role.name == "default").first()
-            if not default_role:
-                default_role = Role(name="default")
-                db.add(default_role)
-                db.commit()
-                db.refresh(default_role)
+            # Id роли "default" берётся из карты прав в памяти
+            default_role_id = await permission_registry.get_default_role_id(db)
 
             # Создаём нового пользователя
             new_user = User(
                 username=user_name,
                 email=user_email,
                 password="oauth_dummy_password",  # Для OAuth-пользователей пароль фиктивный
-                role_id=default_role.id,
+                role_id=default_role_id,
             )
             db.add(new_user)
-            db.commit()
-            db.refresh(new_user)
+            await db.commit()
             user = new_user
+            role_name = DEFAULT_ROLE
+            await audit_log.record(audit.REGISTER, user_id=user.id, ip=ip, provider="google")
+        else:
+            role_name = user.role.name if user.role else None
 
         # Создание токенов
-        access_token = create_access_token(data={"sub": user.username, "role": user.role.name})
-        refresh_token = create_access_token(data={"sub": user.username}, expires_delta=timedelta(days=7))
+        refresh_token, family = await issue_refresh_token(user.username)
+        access_token = create_access_token(data={"sub": user.username, "role": role_name, "fam": family})
+        await audit_log.record(audit.GOOGLE_LOGIN, user_id=user.id, ip=ip)
 
         # Установка токенов в cookies
         response = RedirectResponse(url="http://127.0.0.1:3000/dashboard", status_code=302)
         response.set_cookie(key="access_token", value=access_token, httponly=True)
         response.set_cookie(key="refresh_token", value=refresh_token, httponly=True, path="/refresh-token")
+        # Только что созданный пользователь ещё может отсутствовать на репликах
+        mark_primary_reads(response)
 
         return response
 
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey
+from sqlalchemy import JSON, Column, DateTime, Integer, String, ForeignKey, Index, UniqueConstraint, func
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
 
@@ -18,8 +18,19 @@ class User(Base):
     password = Column(String(100), nullable=False)
     email = Column(String, unique=True, index=True)
     role_id = Column(Integer, ForeignKey('roles.id'))
+    # Растёт при изменении профиля и контактов пользователя; из неё строится ETag списков
+    data_version = Column(Integer, nullable=False, default=0, server_default='0')
     role = relationship('Role', backref='users')
 
+    __table_args__ = (
+        # Поиск по подстроке (ILIKE '%q%') через pg_trgm
+        Index('ix_users_username_trgm', 'username',
+              postgresql_using='gin', postgresql_ops={'username': 'gin_trgm_ops'}),
+        # Поиск по префиксу для коротких запросов (lower(username) LIKE 'q%')
+        Index('ix_users_username_lower_prefix', func.lower(username).label('username_lower'),
+              postgresql_ops={'username_lower': 'text_pattern_ops'}),
+    )
+
 
 class Permission(Base):
     __tablename__ = 'permissions'
@@ -44,5 +55,33 @@ class Contact(Base):
     user = relationship("User", foreign_keys=[user_id], back_populates="contacts")
     contact = relationship("User", foreign_keys=[contact_id])
 
+    __table_args__ = (
+        # Одна связь на пару и индекс (user_id, contact_id) для ON CONFLICT
+        UniqueConstraint("user_id", "contact_id", name="uq_contacts_user_contact"),
+        # Входящие запросы: WHERE contact_id = ? AND confirmed = 0
+        Index("ix_contacts_contact_confirmed", "contact_id", "confirmed"),
+        # Постраничный список контактов: WHERE user_id = ? AND id > ? ORDER BY id
+        Index("ix_contacts_user_id_id", "user_id", "id"),
+        # Подтверждённые контакты без обращения к таблице: общие контакты и рекомендации
+        Index("ix_contacts_user_confirmed_contact", "user_id", "confirmed", "contact_id"),
+    )
+
 
 User.contacts = relationship("Contact", foreign_keys=[Contact.user_id], back_populates="user")
+
+
+class AuditEvent(Base):
+    """Журнал входов, регистраций и изменений контактов. Пишется пакетами из app.audit."""
+    __tablename__ = "audit_events"
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=True)
+    event = Column(String(50), nullable=False)
+    ip = Column(String(45))
+    data = Column(JSON)
+    # Время события в обработчике, а не время записи пакета
+    created_at = Column(DateTime(timezone=True), nullable=False)
+
+    __table_args__ = (
+        # Последние события пользователя: WHERE user_id = ? AND id < ? ORDER BY id DESC
+        Index("ix_audit_events_user_id_id", "user_id", "id"),
+    )
@@ -0,0 +1,161 @@
+import asyncio
+import time
+from collections.abc import Iterable
+from sqlalchemy import Connection, delete, select, true
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.api.models import Role, Permission, RolePermission
+from app.core.config import settings
+from app.core.db import dialect_insert
+
+DEFAULT_ROLE = "default"
+
+# Права, которые получает каждая роль: при создании роли и, для нового права, когда
+# оно впервые появляется в БД. Отозванные вручную права не возвращаются при рестарте.
+DEFAULT_PERMISSIONS = ("contacts:read", "contacts:write", "users:search", "activity:read")
+
+
+# INSERT ... SELECT прав по умолчанию ролям role_names (None — всем ролям); выданные пропускаются
+def default_grants(dialect_name: str, role_names: Iterable[str] | None = None,
+                   permission_names: Iterable[str] = DEFAULT_PERMISSIONS):
+    pairs = select(Role.id, Permission.id).join(Permission, true()).where(Permission.name.in_(permission_names))
+    if role_names is not None:
+        pairs = pairs.where(Role.name.in_(role_names))
+    return (
+        dialect_insert(dialect_name, RolePermission)
+        .from_select(["role_id", "permission_id"], pairs)
+        .on_conflict_do_nothing()
+    )
+
+
+class PermissionRegistry:
+    """Карта роль → набор прав в памяти процесса.
+
+    Загружается при старте и перечитывается по истечении PERMISSIONS_REFRESH_SECONDS:
+    так до всех воркеров доходят изменения из python -m app.cli grant-permission.
+    """
+
+    def __init__(self, refresh_seconds: float):
+        self.refresh_seconds = refresh_seconds
+        self._permissions: dict[str, frozenset[str]] = {}
+        self._role_ids: dict[str, int] = {}
+        self._loaded_at = 0.0
+        self._stale = True
+        self._lock = asyncio.Lock()
+
+    def needs_refresh(self) -> bool:
+        return self._stale or time.monotonic() - self._loaded_at > self.refresh_seconds
+
+    def permissions_for(self, role: str | None) -> frozenset[str]:
+        return self._permissions.get(role, frozenset())
+
+    async def load(self, db: AsyncSession) -> None:
+        roles = (await db.execute(select(Role.id, Role.name))).all()
+        grants = (
+            await db.execute(
+                select(Role.name, Permission.name)
+                .join(RolePermission, RolePermission.role_id == Role.id)
+                .join(Permission, Permission.id == RolePermission.permission_id)
+            )
+        ).all()
+        permissions: dict[str, set[str]] = {name: set() for _, name in roles}
+        for role_name, permission_name in grants:
+            permissions[role_name].add(permission_name)
+
+        self._role_ids = {name: role_id for role_id, name in roles}
+        self._permissions = {name: frozenset(names) for name, names in permissions.items()}
+        self._loaded_at = time.monotonic()
+        self._stale = False
+
+    async def ensure_loaded(self, db: AsyncSession) -> None:
+        if not self.needs_refresh():
+            return
+        async with self._lock:
+            if self.needs_refresh():
+                await self.load(db)
+
+    async def seed(self, db: AsyncSession) -> None:
+        """Создаёт роль "default" и её права по умолчанию, затем загружает карту."""
+        try:
+            await self._seed_defaults(db)
+        except IntegrityError:
+            # Параллельно стартующий воркер успел создать те же записи
+            await db.rollback()
+        await self.load(db)
+
+    async def _seed_defaults(self, db: AsyncSession) -> None:
+        dialect_name = db.get_bind().dialect.name
+        role_created = False
+        if (await db.execute(select(Role.id).where(Role.name == DEFAULT_ROLE))).scalar_one_or_none() is None:
+            db.add(Role(name=DEFAULT_ROLE))
+            await db.flush()
+            role_created = True
+
+        existing = set((await db.execute(
+            select(Permission.name).where(Permission.name.in_(DEFAULT_PERMISSIONS))
+        )).scalars())
+        new_permissions = [name for name in DEFAULT_PERMISSIONS if name not in existing]
+        if new_permissions:
+            db.add_all(Permission(name=name) for name in new_permissions)
+            await db.flush()
+            # Новое право по умолчанию получают все роли, включая созданные импортом
+            await db.execute(default_grants(dialect_name, permission_names=new_permissions))
+        if role_created:
+            await db.execute(default_grants(dialect_name, [DEFAULT_ROLE]))
+        await db.commit()
+
+    async def get_default_role_id(self, db: AsyncSession) -> int:
+        """Id роли "default" без обращения к БД, если карта уже загружена."""
+        await self.ensure_loaded(db)
+        role_id = self._role_ids.get(DEFAULT_ROLE)
+        if role_id is None:
+            # Роль удалили после старта — восстанавливаем её
+            await self.seed(db)
+            role_id = self._role_ids[DEFAULT_ROLE]
+        return role_id
+
+
+permission_registry = PermissionRegistry(refresh_seconds=settings.PERMISSIONS_REFRESH_SECONDS)
+
+
+# Недостающие роли создаются сразу с правами по умолчанию; возвращает id всех ролей
+def ensure_roles(conn: Connection, names: set[str]) -> dict[str, int]:
+    roles = dict(conn.execute(select(Role.name, Role.id).where(Role.name.in_(names))).all())
+    missing = names - roles.keys()
+    if missing:
+        stmt = dialect_insert(conn.dialect.name, Role).on_conflict_do_nothing()
+        conn.execute(stmt, [{"name": name} for name in missing])
+        conn.execute(default_grants(conn.dialect.name, missing))
+        roles.update(conn.execute(select(Role.name, Role.id).where(Role.name.in_(missing))).all())
+    return roles
+
+
+# Выдача права роли, роль и право создаются при необходимости. Воркеры увидят
+# изменение при следующем обновлении карты (PERMISSIONS_REFRESH_SECONDS)
+def grant_permission(conn: Connection, role_name: str, permission_name: str) -> None:
+    ensure_roles(conn, {role_name})
+    conn.execute(dialect_insert(conn.dialect.name, Permission).on_conflict_do_nothing(), {"name": permission_name})
+    pair = (
+        select(Role.id, Permission.id)
+        .join(Permission, true())
+        .where(Role.name == role_name, Permission.name == permission_name)
+    )
+    conn.execute(
+        dialect_insert(conn.dialect.name, RolePermission)
+        .from_select(["role_id", "permission_id"], pair)
+        .on_conflict_do_nothing()
+    )
+    conn.commit()
+
+
+# Отзыв права у роли; возвращает, было ли право выдано
+def revoke_permission(conn: Connection, role_name: str, permission_name: str) -> bool:
+    role_id = select(Role.id).where(Role.name == role_name).scalar_subquery()
+    permission_id = select(Permission.id).where(Permission.name == permission_name).scalar_subquery()
+    result = conn.execute(
+        delete(RolePermission).where(
+            RolePermission.role_id == role_id, RolePermission.permission_id == permission_id
+        )
+    )
+    conn.commit()
+    return result.rowcount > 0
@@ -1,98 +1,180 @@
-from sqlalchemy.orm import Session
-from datetime import timedelta
-from fastapi import APIRouter, Form, Request, Depends, HTTPException, status, Cookie
-from fastapi.responses import RedirectResponse, JSONResponse
-from fastapi.templating import Jinja2Templates
+import hashlib
+import json
+from functools import lru_cache
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import APIRouter, Form, Header, Request, Response, Depends, HTTPException, Query, status, Cookie
+from fastapi.responses import RedirectResponse, JSONResponse, StreamingResponse
 from fastapi.security import OAuth2PasswordBearer
-from app.core.security import hash_password, verify_password, create_access_token, decode_access_token
-from app.core.db import SessionLocal
-from app.api.models import User, Role, Contact
-from app.api.schemas import Token, AddContactRequest
+from app.core.config import settings
+from app.core.security import create_access_token, decode_access_token, key_ring
+from app.core.token_store import issue_refresh_token, revoke_session, rotate_refresh_token
+from app.core.user_cache import CachedUser
+from app.core.hashing import password_hasher
+from app.core.db import get_db, read_session
+from app.core.idempotency import IN_PROGRESS, idempotency_store
+from app.core.response_cache import etag_matches, make_etag, response_cache
+from app.api.schemas import Token, AddContactRequest, ContactBatchRequest, ContactBatchResponse
 from app.api.google_auth import router as google_auth_router
+from app import audit, crud
+from app.audit import audit_log
+from app.api.deps import (
+    client_ip, get_current_user, get_current_db_user, get_read_db, mark_primary_reads, rate_limit,
+    reads_from_primary, read_your_writes, require_permission,
+)
+from app.api.permissions import permission_registry
 
 
 router = APIRouter()
 router.include_router(google_auth_router, tags=["google_auth"])
-templates = Jinja2Templates(directory="app/templates")
+
+
+# Jinja2 загружается при первой отрисовке страницы, а не при импорте
+@lru_cache
+def get_templates():
+    from fastapi.templating import Jinja2Templates
+
+    return Jinja2Templates(directory="app/templates")
+
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 
-def get_current_user(request: Request):
-    # Извлекаем токен из куки
-    token = request.cookies.get("access_token")
-    if not token:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Token not found in cookies",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    # Декодируем токен
-    payload = decode_access_token(token)
-    if payload is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    return payload
-
-
-# Dependency для получения сессии базы данных
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+@router.get("/.well-known/jwks.json", include_in_schema=False)
+async def jwks(request: Request):
+    # Открытые ключи подписи для проверки токенов в других сервисах
+    body, etag = key_ring.jwks
+    headers = {"Cache-Control": f"public, max-age={settings.JWKS_MAX_AGE_SECONDS}", "ETag": etag}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+
+# Ответ на опрос списков с ETag из версии данных пользователя. При совпадении If-None-Match
+# отдаётся 304, иначе тело берётся из кэша ответов. build (запросы к БД и сериализация)
+# выполняется только при промахе; в остальных случаях остаётся один запрос версии по ключу
+async def versioned_response(request: Request, user: CachedUser, db: AsyncSession, build) -> Response:
+    version = await crud.get_data_version(db, user.id)
+    etag = make_etag(user.id, version)
+    # Браузер хранит ответ, но каждый раз сверяет его с сервером
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    key = response_cache.key(request, user.id, version)
+    body = response_cache.get(key)
+    if body is None:
+        body = JSONResponse(await build()).body
+        response_cache.set(key, body)
+    return Response(body, media_type="application/json", headers=headers)
 
 
 @router.get("/register")
 async def register_page(request: Request):
-    return templates.TemplateResponse("register.html", {"request": request})
+    return get_templates().TemplateResponse("register.html", {"request": request})
 
 
-@router.post("/register")
+@router.post(
+    "/register",
+    dependencies=[Depends(rate_limit("register", settings.REGISTER_IP_LIMIT, settings.REGISTER_USERNAME_LIMIT))],
+)
 async def handle_registration(
     username: str = Form(...),
     email: str = Form(...),
     password: str = Form(...),
-    db: Session = Depends(get_db),
+    idempotency_key: str | None = Header(None, max_length=255),
+    ip: str = Depends(client_ip),
+    db: AsyncSession = Depends(get_db),
 ):
-    # Проверка наличия роли "default"
-    default_role = db.query(Role).filter(Role.name == "default").first()
-    if not default_role:
-        # Если роль не существует, создаём её
-        default_role = Role(name="default")
-        db.add(default_role)
-        db.commit()
-        db.refresh(default_role)
-
-    # Хэширование пароля
-    hashed_password = hash_password(password)
-
-    # Создание нового пользователя с ролью по умолчанию
-    new_user = User(username=username, email=email, password=hashed_password, role_id=default_role.id)
-    db.add(new_user)
-    db.commit()
+    if not idempotency_key:
+        return registration_response(await register(db, username, email, password, ip))
+
+    # Повтор с тем же ключом получает сохранённый ответ и не хэширует пароль снова.
+    # Пароль в отпечаток не входит, чтобы не хранить производное от него значение
+    key = f"register:{idempotency_key}"
+    fingerprint = hashlib.sha256(f"{username}\n{email}".encode()).hexdigest()
+    record = await idempotency_store.claim(key, fingerprint, settings.IDEMPOTENCY_LOCK_SECONDS)
+    if record is not None:
+        if record["fingerprint"] != fingerprint:
+            raise HTTPException(status_code=422, detail="Idempotency-Key was already used with other parameters")
+        if record["state"] == IN_PROGRESS:
+            raise HTTPException(
+                status_code=409,
+                detail="A request with this Idempotency-Key is in progress",
+                headers={"Retry-After": "1"},
+            )
+        response = registration_response(record["conflict"])
+        response.headers["Idempotent-Replayed"] = "true"
+        return response
 
-    return RedirectResponse("/login", status_code=303)
+    try:
+        conflict = await register(db, username, email, password, ip)
+    except BaseException:
+        # Ошибку (например, 503 от пула хэширования) можно повторить с тем же ключом
+        await idempotency_store.release(key)
+        raise
+    await idempotency_store.complete(
+        key, {"fingerprint": fingerprint, "conflict": conflict}, settings.IDEMPOTENCY_TTL_SECONDS,
+    )
+    return registration_response(conflict)
+
+
+# Регистрация без лишних запросов: EXISTS до хэширования и одна вставка с ON CONFLICT.
+# Возвращает занятое поле или None, если пользователь создан
+async def register(db: AsyncSession, username: str, email: str, password: str, ip: str) -> str | None:
+    conflict = await crud.registration_conflict(db, username, email)
+    if conflict:
+        return conflict
+
+    # Id роли "default" берётся из карты прав в памяти
+    default_role_id = await permission_registry.get_default_role_id(db)
+    # Пароль хэшируется в пуле; одновременная регистрация того же имени даст конфликт вставки
+    user_id = await crud.register_user(db, username, email, password, role_id=default_role_id)
+    if user_id is None:
+        return await crud.registration_conflict(db, username, email) or crud.REGISTRATION_USERNAME_TAKEN
+    await audit_log.record(audit.REGISTER, user_id=user_id, ip=ip)
+    return None
+
+
+def registration_response(conflict: str | None) -> Response:
+    if conflict == crud.REGISTRATION_USERNAME_TAKEN:
+        return JSONResponse({"detail": "Username already registered"}, status_code=status.HTTP_409_CONFLICT)
+    if conflict == crud.REGISTRATION_EMAIL_TAKEN:
+        return JSONResponse({"detail": "Email already registered"}, status_code=status.HTTP_409_CONFLICT)
+
+    response = RedirectResponse("/login", status_code=303)
+    # Вход сразу после регистрации не должен попасть на отстающую реплику
+    mark_primary_reads(response)
+    return response
 
 
 @router.get("/login")
 async def login_page(request: Request):
-    return templates.TemplateResponse("login.html", {"request": request})
+    return get_templates().TemplateResponse("login.html", {"request": request})
 
 
-@router.post("/login", response_model=Token)
+@router.post(
+    "/login",
+    response_model=Token,
+    dependencies=[Depends(rate_limit("login", settings.LOGIN_IP_LIMIT, settings.LOGIN_USERNAME_LIMIT))],
+)
 async def login(
     username: str = Form(...),
     password: str = Form(...),
-    db: Session = Depends(get_db),
+    ip: str = Depends(client_ip),
+    read_db: AsyncSession = Depends(get_read_db),
+    db: AsyncSession = Depends(get_db),
 ):
-    user = db.query(User).filter(User.username == username).first()
-    if user and verify_password(password, user.password):
-        access_token = create_access_token(data={"sub": user.username, "role": user.role.name})
-        new_refresh_token = create_access_token(data={"sub": user.username}, expires_delta=timedelta(days=7))
+    # Поиск пользователя идёт в реплику; основная БД нужна только для пересчёта хэша
+    user = await crud.get_user_by_username(read_db, username)
+    valid, new_hash = await password_hasher.verify_and_update(password, user.password) if user else (False, None)
+    if valid:
+        if new_hash:
+            # Хэш другой схемы или стоимости заменяется, пока пароль известен
+            await crud.update_password_hash(db, user.id, user.password, new_hash)
+        # Access-токен знает свою refresh-цепочку (fam), чтобы logout мог её отозвать
+        new_refresh_token, family = await issue_refresh_token(user.username)
+        access_token = create_access_token(data={"sub": user.username, "role": user.role.name, "fam": family})
+        await audit_log.record(audit.LOGIN, user_id=user.id, ip=ip)
         # Перенаправляем на dashboard для шаблонов FastApi
         # response = RedirectResponse(url="/dashboard", status_code=302)
         response = JSONResponse(content={"message": "Login successful"})
@@ -100,170 +182,271 @@ async def login(
         response.set_cookie("refresh_token", new_refresh_token, httponly=True, path="/refresh-token")
         return response
 
+    # Неудачные попытки пишутся и для несуществующих имён, без привязки к пользователю
+    await audit_log.record(audit.LOGIN_FAILED, user_id=user.id if user else None, ip=ip, username=username)
     raise HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Invalid credentials"
     )
 
 
-def get_user_and_contact_by_username(current_user: dict, contact_username: str, db: Session):
-    # Получаем пользователя по текущему токену
-    user = db.query(User).filter(User.username == current_user["sub"]).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="Current user not found")
-
-    # Получаем контакт по имени
-    contact = db.query(User).filter(User.username == contact_username).first()
-    if not contact:
-        raise HTTPException(status_code=404, detail="User not found")
-
-    # Проверяем, что контакт существует в базе
-    existing_contact = db.query(Contact).filter(Contact.user_id == user.id, Contact.contact_id == contact.id).first()
-
-    return user, contact, existing_contact
-
-
-@router.post("/add-contact")
+@router.post("/add-contact", dependencies=[Depends(require_permission("contacts:write")), Depends(read_your_writes)])
 async def add_contact(
     request: AddContactRequest,
-    current_user: dict = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    ip: str = Depends(client_ip),
+    current_user: CachedUser = Depends(get_current_db_user),
+    db: AsyncSession = Depends(get_db),
 ):
     contact_username = request.contact_username
-    if contact_username == current_user["sub"]:
+    if contact_username == current_user.username:
         raise HTTPException(status_code=400, detail="You cannot add yourself as a contact")
 
-    # Получаем текущего пользователя и целевого контакта
-    user, contact, existing_contact = get_user_and_contact_by_username(current_user, contact_username, db)
-
-    if existing_contact:
+    # Вставка и подтверждение встречной записи выполняются в одной транзакции
+    result = await crud.add_contact(db, current_user.id, contact_username)
+    if result == crud.CONTACT_USER_NOT_FOUND:
+        raise HTTPException(status_code=404, detail="User not found")
+    if result == crud.CONTACT_EXISTS:
         raise HTTPException(status_code=400, detail="Contact already exists")
-
-    # Добавляем новый контакт с confirmed=0
-    new_contact = Contact(user_id=user.id, contact_id=contact.id, confirmed=0)
-    db.add(new_contact)
-    db.commit()
-
-    # Проверяем, есть ли запись, где contact.id -> user.id с confirmed=0
-    reciprocal_contact = (
-        db.query(Contact)
-        .filter(Contact.user_id == contact.id, Contact.contact_id == user.id, Contact.confirmed == 0)
-        .first()
-    )
-
-    if reciprocal_contact:
-        # Если такая запись есть, обновляем обе записи на confirmed=1
-        new_contact.confirmed = 1
-        reciprocal_contact.confirmed = 1
-        db.commit()
+    await audit_log.record(audit.CONTACT_ADDED, user_id=current_user.id, ip=ip, contacts=[contact_username])
+    if result == crud.CONTACT_CONFIRMED:
         return {"message": "Contact confirmed from both sides!"}
 
     return {"message": "Contact added successfully, waiting for confirmation from the other side."}
 
 
-@router.get("/pending-requests")
-async def pending_requests(current_user: dict = Depends(get_current_user), db: Session = Depends(get_db)):
-    # Получаем текущего пользователя
-    user = db.query(User).filter(User.username == current_user["sub"]).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
-    # Находим все запросы, где текущий пользователь является contact_id и статус не подтверждён
-    pending = (
-        db.query(User, Contact)
-        .join(Contact, User.id == Contact.user_id)
-        .filter(Contact.contact_id == user.id, Contact.confirmed == 0)
-        .all()
-    )
-
-    # Формируем список запросов
-    pending_list = [
-        {
-            "id": requester[0].id,  # Данные пользователя, который отправил запрос
-            "username": requester[0].username,
-            "request_id": requester[1].id  # ID связи в таблице Contact
+@router.get("/pending-requests", dependencies=[Depends(require_permission("contacts:read"))])
+async def pending_requests(
+    request: Request,
+    limit: int = Query(settings.CONTACTS_PAGE_SIZE, ge=1, le=settings.CONTACTS_MAX_PAGE_SIZE),
+    cursor: int | None = None,
+    user: CachedUser = Depends(get_current_db_user),
+    db: AsyncSession = Depends(get_read_db),
+):
+    async def build():
+        # Находим запросы, где текущий пользователь является contact_id и статус не подтверждён
+        rows = await crud.list_pending_requests(db, user.id, limit + 1, after_id=cursor)
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = rows[-1].request_id
+
+        # Формируем список запросов
+        pending_list = [
+            {
+                "id": row.id,  # Данные пользователя, который отправил запрос
+                "username": row.username,
+                "request_id": row.request_id  # ID связи в таблице Contact
+            }
+            for row in rows
+        ]
+
+        return {
+            "pending_requests": pending_list,
+            "pending_count": await crud.count_pending_requests(db, user.id),
+            "next_cursor": next_cursor,
         }
-        for requester in pending
-    ]
 
-    return {"pending_requests": pending_list}
+    return await versioned_response(request, user, db, build)
 
 
-@router.delete("/remove-contact")
+@router.delete("/remove-contact", dependencies=[Depends(require_permission("contacts:write")), Depends(read_your_writes)])
 async def remove_contact(
     contact_username: str,
-    current_user: dict = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    ip: str = Depends(client_ip),
+    current_user: CachedUser = Depends(get_current_db_user),
+    db: AsyncSession = Depends(get_db),
 ):
-    # Используем вспомогательную функцию
-    user, contact, existing_contact = get_user_and_contact_by_username(current_user, contact_username, db)
-
-    if not existing_contact:
+    # Удаляем запись текущего пользователя и встречную запись одним запросом
+    result = await crud.remove_contact(db, current_user.id, contact_username)
+    if result == crud.CONTACT_USER_NOT_FOUND:
+        raise HTTPException(status_code=404, detail="User not found")
+    if result == crud.CONTACT_NOT_FOUND:
         raise HTTPException(status_code=404, detail="Contact not found")
+    await audit_log.record(audit.CONTACT_REMOVED, user_id=current_user.id, ip=ip, contacts=[contact_username])
 
-    # Удаляем запись текущего пользователя
-    db.delete(existing_contact)
-
-    # Удаляем запись контакта, если существует
-    reciprocal_contact = db.query(Contact).filter(
-        Contact.user_id == contact.id,
-        Contact.contact_id == user.id,
-    ).first()
-
-    if reciprocal_contact:
-        db.delete(reciprocal_contact)
+    return {"message": f"Contact with username {contact_username} removed successfully for both users"}
 
-    db.commit()
 
-    return {"message": f"Contact with username {contact_username} removed successfully for both users"}
+@router.post(
+    "/add-contacts",
+    response_model=ContactBatchResponse,
+    dependencies=[Depends(require_permission("contacts:write")), Depends(read_your_writes)],
+)
+async def add_contacts(
+    request: ContactBatchRequest,
+    ip: str = Depends(client_ip),
+    current_user: CachedUser = Depends(get_current_db_user),
+    db: AsyncSession = Depends(get_db),
+):
+    # Пакетное добавление для синхронизации адресной книги; статус по каждому имени
+    usernames = list(dict.fromkeys(request.contact_usernames))
+    statuses = await crud.add_contacts(db, current_user.id, usernames)
+    # Одно событие на пакет, только с действительно добавленными именами
+    added = [name for name in usernames if statuses[name] in (crud.CONTACT_PENDING, crud.CONTACT_CONFIRMED)]
+    if added:
+        await audit_log.record(audit.CONTACT_ADDED, user_id=current_user.id, ip=ip, contacts=added)
+    return {"results": [{"username": username, "status": statuses[username]} for username in usernames]}
+
+
+@router.post(
+    "/remove-contacts",
+    response_model=ContactBatchResponse,
+    dependencies=[Depends(require_permission("contacts:write")), Depends(read_your_writes)],
+)
+async def remove_contacts(
+    request: ContactBatchRequest,
+    ip: str = Depends(client_ip),
+    current_user: CachedUser = Depends(get_current_db_user),
+    db: AsyncSession = Depends(get_db),
+):
+    usernames = list(dict.fromkeys(request.contact_usernames))
+    statuses = await crud.remove_contacts(db, current_user.id, usernames)
+    removed = [name for name in usernames if statuses[name] == crud.CONTACT_REMOVED]
+    if removed:
+        await audit_log.record(audit.CONTACT_REMOVED, user_id=current_user.id, ip=ip, contacts=removed)
+    return {"results": [{"username": username, "status": statuses[username]} for username in usernames]}
 
 
-@router.get("/search-user")
+@router.get("/search-user", dependencies=[Depends(require_permission("users:search"))])
 async def search_users(
     query: str,
-    current_user: dict = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    response: Response,
+    limit: int = Query(settings.SEARCH_PAGE_SIZE, ge=1, le=settings.SEARCH_MAX_PAGE_SIZE),
+    cursor: int | None = None,
+    current_user: CachedUser = Depends(get_current_db_user),
+    db: AsyncSession = Depends(get_read_db)
 ):
-    # Получаем всех пользователей, соответствующих запросу
-    users = db.query(User).filter(User.username.ilike(f"%{query}%")).all()
-    # Получаем текущего пользователя
-    user = db.query(User).filter(User.username == current_user["sub"]).first()
-    # Получаем список контактов текущего пользователя
-    contacts = db.query(Contact).filter(Contact.user_id == user.id).all()
-    contact_ids = [contact.contact_id for contact in contacts]
-    # Исключаем текущего пользователя и уже добавленных контактов
-    filtered_users = [
-        {"id": user.id, "username": user.username}
-        for user in users
-        if user and user.username != current_user["sub"] and user.id not in contact_ids
-    ]
-
-    return filtered_users
-
-
-@router.get("/user-info")
-async def user_info(current_user: dict = Depends(get_current_user), db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.username == current_user["sub"]).first()
-    if not user:
+    """Поиск по имени без учёта регистра.
+
+    Запрос от трёх символов ищет подстроку, запрос из одного-двух символов — только
+    начало имени.
+    """
+    # Запрашиваем на одну запись больше, чтобы понять, есть ли следующая страница
+    rows = await crud.search_users(db, current_user.id, query, limit + 1, after_id=cursor)
+    if len(rows) > limit:
+        rows = rows[:limit]
+        # Курсор следующей страницы передаётся в заголовке, тело остаётся списком
+        response.headers["X-Next-Cursor"] = str(rows[-1].id)
+
+    return [{"id": row.id, "username": row.username} for row in rows]
+
+
+@router.get("/user-info", dependencies=[Depends(require_permission("contacts:read"))])
+async def user_info(
+    request: Request,
+    limit: int = Query(settings.CONTACTS_PAGE_SIZE, ge=1, le=settings.CONTACTS_MAX_PAGE_SIZE),
+    cursor: int | None = None,
+    user: CachedUser = Depends(get_current_db_user),
+    db: AsyncSession = Depends(get_read_db),
+):
+    async def build():
+        rows = await crud.list_contacts(db, user.id, limit + 1, after_id=cursor)
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = rows[-1].link_id
+
+        contact_list = [
+            {
+                "id": row.id,
+                "username": row.username,
+                "confirmed": row.confirmed
+            }
+            for row in rows
+        ]
+        contacts_count, confirmed_count = await crud.count_contacts(db, user.id)
+
+        return {
+            "username": user.username,
+            "role": user.role,
+            "contacts": contact_list,
+            "contacts_count": contacts_count,
+            "confirmed_count": confirmed_count,
+            "next_cursor": next_cursor,
+        }
+
+    return await versioned_response(request, user, db, build)
+
+
+@router.get("/user-info/contacts", dependencies=[Depends(require_permission("contacts:read"))])
+async def stream_contacts(request: Request, user: CachedUser = Depends(get_current_db_user)):
+    # Полный список контактов в формате NDJSON через серверный курсор.
+    # Сессия открывается внутри генератора: сессия из get_db закрывается до начала отдачи тела.
+    use_primary = reads_from_primary(request)
+
+    async def rows():
+        async with read_session(use_primary) as db:
+            result = await db.stream(crud.contacts_query(user.id).execution_options(yield_per=500))
+            async for row in result:
+                yield json.dumps({"id": row.id, "username": row.username, "confirmed": row.confirmed}) + "\n"
+
+    return StreamingResponse(rows(), media_type="application/x-ndjson")
+
+
+@router.get("/mutual-contacts", dependencies=[Depends(require_permission("contacts:read"))])
+async def mutual_contacts(
+    username: str,
+    limit: int = Query(settings.CONTACTS_PAGE_SIZE, ge=1, le=settings.CONTACTS_MAX_PAGE_SIZE),
+    cursor: int | None = None,
+    user: CachedUser = Depends(get_current_db_user),
+    db: AsyncSession = Depends(get_read_db),
+):
+    # Подтверждённые контакты, общие у текущего пользователя и username
+    other = await crud.get_cached_user(db, username)
+    if not other:
         raise HTTPException(status_code=404, detail="User not found")
+    rows, mutual_count = await crud.mutual_contacts(db, user.id, other.id, limit + 1, after_id=cursor)
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = rows[-1].id
+
+    return {
+        "username": other.username,
+        "mutual": [{"id": row.id, "username": row.username} for row in rows],
+        "mutual_count": mutual_count,
+        "next_cursor": next_cursor,
+    }
+
+
+@router.get("/contact-suggestions", dependencies=[Depends(require_permission("contacts:read"))])
+async def contact_suggestions(
+    limit: int = Query(settings.CONTACT_SUGGESTIONS_LIMIT, ge=1, le=settings.CONTACT_SUGGESTIONS_MAX_LIMIT),
+    user: CachedUser = Depends(get_current_db_user),
+    db: AsyncSession = Depends(get_read_db),
+):
+    rows = await crud.suggest_contacts(db, user.id, limit, settings.CONTACT_SUGGESTIONS_MAX_FANOUT)
+    return [{"id": row.id, "username": row.username, "mutual_count": row.mutual_count} for row in rows]
 
-    contacts = db.query(User, Contact).join(Contact,
-                                            User.id == Contact.contact_id).filter(Contact.user_id == user.id).all()
-    contact_list = [
-        {
-            "id": contact[0].id,
-            "username": contact[0].username,
-            "confirmed": contact[1].confirmed
-        }
-        for contact in contacts
-    ]
 
-    return {"username": user.username, "role": user.role.name, "contacts": contact_list}
+@router.get("/activity", dependencies=[Depends(require_permission("activity:read"))])
+async def activity(
+    limit: int = Query(settings.ACTIVITY_PAGE_SIZE, ge=1, le=settings.ACTIVITY_MAX_PAGE_SIZE),
+    cursor: int | None = None,
+    user: CachedUser = Depends(get_current_db_user),
+    db: AsyncSession = Depends(get_read_db),
+):
+    # Последние события текущего пользователя; журнал пишется с задержкой до AUDIT_FLUSH_SECONDS
+    if not audit_log.sink.queryable:
+        raise HTTPException(status_code=404, detail="Activity log is not stored in the database")
+    rows = await crud.list_activity(db, user.id, limit + 1, before_id=cursor)
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = rows[-1].id
+
+    return {
+        "events": [
+            {"id": row.id, "event": row.event, "ip": row.ip, "data": row.data, "created_at": row.created_at}
+            for row in rows
+        ],
+        "next_cursor": next_cursor,
+    }
 
 
 @router.get("/dashboard")
 async def dashboard_page(request: Request, current_user: dict = Depends(get_current_user)):
-    return templates.TemplateResponse("dashboard.html", {"request": request, "username": current_user["sub"]})
+    return get_templates().TemplateResponse("dashboard.html", {"request": request, "username": current_user["sub"]})
 
 
 @router.get("/debug-token")
@@ -279,24 +462,36 @@ async def debug_token(request: Request):
 
 
 @router.post("/refresh-token")
-async def refresh_token_handler(refresh_token: str = Cookie(None)):
+async def refresh_token_handler(refresh_token: str = Cookie(None), db: AsyncSession = Depends(get_read_db)):
     if not refresh_token:
         raise HTTPException(status_code=401, detail="Refresh token not found")
 
-    payload = decode_access_token(refresh_token)
-    if not payload:
+    # Refresh-токен одноразовый: старый гасится, выдаётся новый из той же цепочки
+    rotated = await rotate_refresh_token(refresh_token)
+    if not rotated:
         raise HTTPException(status_code=401, detail="Invalid refresh token")
+    username, new_refresh_token, family = rotated
 
-    access_token = create_access_token(data={"sub": payload["sub"]}, expires_delta=timedelta(minutes=15))
+    user = await crud.get_cached_user(db, username)
+    if not user:
+        raise HTTPException(status_code=401, detail="Invalid refresh token")
+    access_token = create_access_token(data={"sub": user.username, "role": user.role, "fam": family})
 
     response = RedirectResponse(url="/dashboard", status_code=302)
     response.set_cookie(key="access_token", value=access_token, httponly=True)
+    response.set_cookie("refresh_token", new_refresh_token, httponly=True, path="/refresh-token")
 
     return response
 
 
 @router.get("/logout")
-async def logout():
+async def logout(request: Request):
+    # Refresh-кука ограничена путём /refresh-token, поэтому цепочка берётся из access-токена
+    token = request.cookies.get("access_token")
+    payload = decode_access_token(token) if token else None
+    if payload:
+        await revoke_session(payload)
+
     response = RedirectResponse(url="/login", status_code=302)
     # Удаляем токен из куки
     response.delete_cookie("access_token")
@@ -1,4 +1,5 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
+from app.core.config import settings
 
 
 class Token(BaseModel):
@@ -40,4 +41,17 @@ class UserResponse(UserBase):
 
 
 class AddContactRequest(BaseModel):
-    contact_username: str
\ No newline at end of file
+    contact_username: str
+
+
+class ContactBatchRequest(BaseModel):
+    contact_usernames: list[str] = Field(min_length=1, max_length=settings.CONTACTS_BATCH_MAX_SIZE)
+
+
+class ContactBatchItem(BaseModel):
+    username: str
+    status: str
+
+
+class ContactBatchResponse(BaseModel):
+    results: list[ContactBatchItem]
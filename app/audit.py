@@ -0,0 +1,186 @@
+import asyncio
+import json
+import logging
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from pathlib import Path
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from app.api.models import AuditEvent, User
+from app.core.config import settings
+from app.core.db import AsyncSessionLocal
+from app.core.metrics import audit_events
+
+logger = logging.getLogger(__name__)
+
+# Типы событий журнала
+LOGIN = "login"
+LOGIN_FAILED = "login_failed"
+GOOGLE_LOGIN = "google_login"
+REGISTER = "register"
+CONTACT_ADDED = "contact_added"
+CONTACT_REMOVED = "contact_removed"
+
+# Что делать, когда очередь заполнена
+OVERFLOW_DROP_NEW = "drop_new"
+OVERFLOW_DROP_OLDEST = "drop_oldest"
+OVERFLOW_BLOCK = "block"
+
+
+class AuditSink(ABC):
+    """Приёмник пакетов событий; write возвращает число записанных событий."""
+
+    @abstractmethod
+    async def write(self, events: list[dict]) -> int:
+        ...
+
+    @property
+    def queryable(self) -> bool:
+        return False
+
+
+class DatabaseAuditSink(AuditSink):
+    """Таблица audit_events: один INSERT на пакет."""
+
+    async def write(self, events: list[dict]) -> int:
+        async with AsyncSessionLocal() as db:
+            try:
+                await db.execute(insert(AuditEvent), events)
+                await db.commit()
+                return len(events)
+            except IntegrityError:
+                await db.rollback()
+            # Пользователя удалили до записи пакета. Его события всё равно удалил бы
+            # ON DELETE CASCADE, поэтому они отбрасываются, остальные пишутся
+            user_ids = {event["user_id"] for event in events if event["user_id"] is not None}
+            existing = set((await db.execute(select(User.id).where(User.id.in_(user_ids)))).scalars())
+            kept = [event for event in events if event["user_id"] is None or event["user_id"] in existing]
+            if kept:
+                await db.execute(insert(AuditEvent), kept)
+                await db.commit()
+            return len(kept)
+
+    @property
+    def queryable(self) -> bool:
+        return True
+
+
+class JsonlAuditSink(AuditSink):
+    """Файл JSONL: строка на событие, запись в отдельном потоке."""
+
+    def __init__(self, path: str):
+        self._path = Path(path)
+
+    def _append(self, lines: str) -> None:
+        with self._path.open("a", encoding="utf-8") as file:
+            file.write(lines)
+
+    async def write(self, events: list[dict]) -> int:
+        lines = "".join(
+            json.dumps({**event, "created_at": event["created_at"].isoformat()}, ensure_ascii=False) + "\n"
+            for event in events
+        )
+        await asyncio.to_thread(self._append, lines)
+        return len(events)
+
+
+class AuditLog:
+    """Журнал событий, который не задерживает обработчики.
+
+    record() кладёт событие в ограниченную очередь в памяти, фоновая задача
+    пишет накопленное пакетами по batch_size не реже раза в flush_seconds.
+    При переполнении очереди drop_new отбрасывает новое событие, drop_oldest —
+    самое старое, block заставляет обработчик ждать места. Пакет, который
+    приёмник не принял, теряется: сбой журнала не должен ронять запросы.
+    """
+
+    def __init__(self, sink: AuditSink, max_queue: int, batch_size: int, flush_seconds: float, overflow: str):
+        if overflow not in (OVERFLOW_DROP_NEW, OVERFLOW_DROP_OLDEST, OVERFLOW_BLOCK):
+            raise ValueError(f"Unknown audit overflow policy: {overflow}")
+        self.sink = sink
+        self._max_queue = max_queue
+        self._batch_size = batch_size
+        self._flush_seconds = flush_seconds
+        self._overflow = overflow
+        # Очередь и событие создаются в start, внутри event loop приложения
+        self._queue: asyncio.Queue | None = None
+        self._batch_ready: asyncio.Event | None = None
+        self._stopping = False
+        self._task: asyncio.Task | None = None
+
+    async def record(self, event: str, user_id: int | None = None, ip: str | None = None, **data) -> None:
+        # До start (CLI, скрипты) и при AUDIT_ENABLED=false события не пишутся
+        if self._queue is None:
+            return
+        item = {
+            "event": event, "user_id": user_id, "ip": ip, "data": data or None,
+            "created_at": datetime.now(timezone.utc),
+        }
+        if self._overflow == OVERFLOW_BLOCK:
+            if self._queue.full():
+                self._batch_ready.set()
+            await self._queue.put(item)
+        else:
+            if self._queue.full():
+                audit_events.labels("dropped").inc()
+                if self._overflow == OVERFLOW_DROP_NEW:
+                    return
+                self._queue.get_nowait()
+            self._queue.put_nowait(item)
+        if self._queue.qsize() >= self._batch_size:
+            self._batch_ready.set()
+
+    async def flush(self) -> None:
+        while self._queue is not None and not self._queue.empty():
+            batch = [self._queue.get_nowait() for _ in range(min(self._batch_size, self._queue.qsize()))]
+            try:
+                written = await self.sink.write(batch)
+                audit_events.labels("written").inc(written)
+                if written < len(batch):
+                    logger.warning("Skipped %s audit events of deleted users", len(batch) - written)
+                    audit_events.labels("failed").inc(len(batch) - written)
+            except Exception:
+                logger.exception("Failed to write %s audit events", len(batch))
+                audit_events.labels("failed").inc(len(batch))
+
+    async def _flush_forever(self) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._batch_ready.wait(), self._flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._batch_ready.clear()
+            await self.flush()
+
+    async def start(self) -> None:
+        self._queue = asyncio.Queue(maxsize=self._max_queue)
+        self._batch_ready = asyncio.Event()
+        self._stopping = False
+        self._task = asyncio.create_task(self._flush_forever())
+
+    async def stop(self) -> None:
+        # Дописываем всё, что уже в очереди, до закрытия соединений с БД
+        if self._task is not None:
+            self._stopping = True
+            self._batch_ready.set()
+            await self._task
+            self._task = None
+        await self.flush()
+        self._queue = None
+
+
+def _create_audit_sink() -> AuditSink:
+    if settings.AUDIT_SINK == "database":
+        return DatabaseAuditSink()
+    if settings.AUDIT_SINK == "jsonl":
+        return JsonlAuditSink(settings.AUDIT_JSONL_PATH)
+    raise ValueError(f"Unknown audit sink: {settings.AUDIT_SINK}")
+
+
+audit_log = AuditLog(
+    _create_audit_sink(),
+    max_queue=settings.AUDIT_QUEUE_SIZE,
+    batch_size=settings.AUDIT_BATCH_SIZE,
+    flush_seconds=settings.AUDIT_FLUSH_SECONDS,
+    overflow=settings.AUDIT_OVERFLOW,
+)
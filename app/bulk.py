@@ -0,0 +1,135 @@
+import csv
+import json
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import IO, Iterable, Iterator
+from passlib.exc import UnknownHashError
+from sqlalchemy import select
+from sqlalchemy.engine import Connection
+from app.api.models import User, Role
+from app.api.permissions import DEFAULT_ROLE, ensure_roles
+from app.core.db import dialect_insert
+from app.core.security import hash_password, pwd_context
+
+EXPORT_FIELDS = ("id", "username", "email", "role")
+
+
+@dataclass
+class ImportReport:
+    inserted: int = 0
+    conflicts: list[dict] = field(default_factory=list)
+
+    def add_conflict(self, line: int, username: str | None, error: str) -> None:
+        self.conflicts.append({"line": line, "username": username, "error": error})
+
+
+# Построчное чтение CSV или JSONL без загрузки файла в память
+def read_rows(stream: IO[str], fmt: str) -> Iterator[dict]:
+    if fmt == "csv":
+        yield from csv.DictReader(stream)
+    elif fmt == "jsonl":
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+    else:
+        raise ValueError(f"Unknown format: {fmt}")
+
+
+def _batched(iterable: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def import_users(
+    conn: Connection,
+    rows: Iterable[dict],
+    batch_size: int = 1000,
+    workers: int | None = None,
+) -> ImportReport:
+    """Импортирует пользователей пачками.
+
+    Строка содержит username, email и либо password (хэшируется параллельно
+    в пуле процессов), либо уже готовый password_hash. Необязательное поле role
+    задаёт роль по имени. Дубликаты по username/email попадают в отчёт.
+    """
+    report = ImportReport()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for batch in _batched(enumerate(rows, start=1), batch_size):
+            valid: list[tuple[int, dict]] = []
+            seen: set[str] = set()
+            for line, row in batch:
+                username = (row.get("username") or "").strip()
+                email = (row.get("email") or "").strip() or None
+                if not username:
+                    report.add_conflict(line, None, "username is required")
+                    continue
+                if username in seen or (email and email in seen):
+                    report.add_conflict(line, username, "duplicate in input")
+                    continue
+                if row.get("password_hash"):
+                    try:
+                        pwd_context.identify(row["password_hash"], required=True)
+                    except (UnknownHashError, ValueError):
+                        report.add_conflict(line, username, "unsupported password hash")
+                        continue
+                elif not row.get("password"):
+                    report.add_conflict(line, username, "password or password_hash is required")
+                    continue
+                seen.add(username)
+                if email:
+                    seen.add(email)
+                valid.append((line, {**row, "username": username, "email": email}))
+
+            if not valid:
+                continue
+
+            # Хэшируем только строки с открытым паролем, параллельно во всех процессах
+            plain = [row["password"] for _, row in valid if not row.get("password_hash")]
+            hashes = iter(pool.map(hash_password, plain, chunksize=max(1, len(plain) // (4 * (workers or 4)))))
+            roles = ensure_roles(conn, {row.get("role") or DEFAULT_ROLE for _, row in valid})
+
+            values = [
+                {
+                    "username": row["username"],
+                    "email": row["email"],
+                    "password": row.get("password_hash") or next(hashes),
+                    "role_id": roles[row.get("role") or DEFAULT_ROLE],
+                }
+                for _, row in valid
+            ]
+            # executemany с ON CONFLICT DO NOTHING: в RETURNING попадают только вставленные строки
+            stmt = dialect_insert(conn.dialect.name, User).on_conflict_do_nothing().returning(User.username)
+            inserted = set(conn.execute(stmt, values).scalars())
+            conn.commit()
+
+            report.inserted += len(inserted)
+            for line, row in valid:
+                if row["username"] not in inserted:
+                    report.add_conflict(line, row["username"], "username or email already exists")
+    return report
+
+
+def export_users(conn: Connection, stream: IO[str], fmt: str, batch_size: int = 1000,
+                 include_password_hash: bool = False) -> int:
+    """Выгружает пользователей через серверный курсор, не держа всю таблицу в памяти."""
+    columns = [User.id, User.username, User.email, Role.name.label("role")]
+    fields = list(EXPORT_FIELDS)
+    if include_password_hash:
+        columns.append(User.password.label("password_hash"))
+        fields.append("password_hash")
+    stmt = select(*columns).outerjoin(Role, Role.id == User.role_id).order_by(User.id)
+    result = conn.execution_options(stream_results=True, yield_per=batch_size).execute(stmt)
+
+    writer = csv.DictWriter(stream, fieldnames=fields) if fmt == "csv" else None
+    if writer:
+        writer.writeheader()
+    count = 0
+    for row in result.mappings():
+        if writer:
+            writer.writerow(dict(row))
+        else:
+            stream.write(json.dumps(dict(row), ensure_ascii=False) + "\n")
+        count += 1
+    return count
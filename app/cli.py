@@ -0,0 +1,188 @@
+"""Консольные команды сервиса.
+
+    python -m app.cli import-users users.csv --batch-size 5000 --report conflicts.jsonl
+    python -m app.cli export-users users.jsonl --format jsonl
+    python -m app.cli generate-signing-key keys/ --algorithm EdDSA
+    python -m app.cli calibrate-hash --scheme argon2 --target-ms 200
+    python -m app.cli grant-permission moderator users:search
+    python -m app.cli revoke-permission moderator users:search
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from app.api.permissions import grant_permission, revoke_permission
+from app.bulk import export_users, import_users, read_rows
+from app.core.config import settings
+from app.core.db import create_sync_engine
+
+
+def _detect_format(path: str, fmt: str | None) -> str:
+    if fmt:
+        return fmt
+    return "jsonl" if Path(path).suffix in (".jsonl", ".ndjson") else "csv"
+
+
+def import_users_command(args: argparse.Namespace) -> int:
+    fmt = _detect_format(args.path, args.format)
+    with open(args.path, newline="", encoding="utf-8") as stream, create_sync_engine().connect() as conn:
+        report = import_users(conn, read_rows(stream, fmt), batch_size=args.batch_size, workers=args.workers)
+
+    report_stream = open(args.report, "w", encoding="utf-8") if args.report else sys.stderr
+    try:
+        for conflict in sorted(report.conflicts, key=lambda item: item["line"]):
+            report_stream.write(json.dumps(conflict, ensure_ascii=False) + "\n")
+    finally:
+        if args.report:
+            report_stream.close()
+    print(f"Imported {report.inserted} users, {len(report.conflicts)} conflicts")
+    return 1 if report.conflicts else 0
+
+
+def export_users_command(args: argparse.Namespace) -> int:
+    fmt = _detect_format(args.path, args.format)
+    with open(args.path, "w", newline="", encoding="utf-8") as stream, create_sync_engine().connect() as conn:
+        count = export_users(conn, stream, fmt, batch_size=args.batch_size,
+                             include_password_hash=args.include_password_hash)
+    print(f"Exported {count} users")
+    return 0
+
+
+def generate_signing_key_command(args: argparse.Namespace) -> int:
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import ed25519, rsa
+
+    if args.algorithm == "RS256":
+        key = rsa.generate_private_key(public_exponent=65537, key_size=args.rsa_bits)
+    else:
+        key = ed25519.Ed25519PrivateKey.generate()
+    pem = key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    )
+    # kid по времени создания: новый ключ оказывается последним по имени и становится активным
+    kid = args.kid or datetime.utcnow().strftime("%Y%m%d%H%M%S")
+    path = Path(args.directory) / f"{kid}.pem"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, "wb") as stream:
+        stream.write(pem)
+    print(f"Created {path} (kid={kid})")
+    return 0
+
+
+def calibrate_hash_command(args: argparse.Namespace) -> int:
+    from app.core.security import build_password_context
+
+    # Стоимость растёт, пока медиана проверки укладывается в целевое время
+    costs = range(4, 20) if args.scheme == "bcrypt" else range(1, 33)
+    chosen = None
+    for cost in costs:
+        context = build_password_context(
+            args.scheme,
+            bcrypt_rounds=cost if args.scheme == "bcrypt" else settings.BCRYPT_ROUNDS,
+            argon2_time_cost=cost if args.scheme == "argon2" else settings.ARGON2_TIME_COST,
+            argon2_memory_cost=args.memory_cost, argon2_parallelism=args.parallelism,
+        )
+        hashed = context.hash("calibration-password")
+        samples = []
+        for _ in range(args.samples):
+            started = time.perf_counter()
+            context.verify("calibration-password", hashed)
+            samples.append((time.perf_counter() - started) * 1000)
+        latency = statistics.median(samples)
+        print(f"{args.scheme} cost={cost}: {latency:.1f} ms")
+        if latency > args.target_ms:
+            break
+        chosen = (cost, latency)
+
+    if chosen is None:
+        print(f"Even the lowest cost exceeds {args.target_ms} ms", file=sys.stderr)
+        return 1
+    cost, latency = chosen
+    # bcrypt и argon2 отпускают GIL, поэтому пул масштабируется до числа ядер
+    parallel = min(settings.PASSWORD_HASH_WORKERS, os.cpu_count() or 1)
+    print(f"\nPASSWORD_HASH_SCHEME={args.scheme}")
+    if args.scheme == "bcrypt":
+        print(f"BCRYPT_ROUNDS={cost}")
+    else:
+        print(f"ARGON2_TIME_COST={cost}\nARGON2_MEMORY_COST={args.memory_cost}\nARGON2_PARALLELISM={args.parallelism}")
+    print(f"# ~{latency:.0f} ms per login, ~{parallel * 1000 / latency:.0f} logins/s per process "
+          f"with {parallel} hashing threads")
+    return 0
+
+
+def grant_permission_command(args: argparse.Namespace) -> int:
+    with create_sync_engine().connect() as conn:
+        grant_permission(conn, args.role, args.permission)
+    print(f"Granted {args.permission} to {args.role}; workers pick it up within "
+          f"{settings.PERMISSIONS_REFRESH_SECONDS} s")
+    return 0
+
+
+def revoke_permission_command(args: argparse.Namespace) -> int:
+    with create_sync_engine().connect() as conn:
+        revoked = revoke_permission(conn, args.role, args.permission)
+    if not revoked:
+        print(f"{args.role} does not have {args.permission}", file=sys.stderr)
+        return 1
+    print(f"Revoked {args.permission} from {args.role}; workers pick it up within "
+          f"{settings.PERMISSIONS_REFRESH_SECONDS} s")
+    return 0
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.cli")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = commands.add_parser("import-users", help="Импорт пользователей из CSV/JSONL")
+    import_parser.add_argument("path")
+    import_parser.add_argument("--format", choices=["csv", "jsonl"])
+    import_parser.add_argument("--batch-size", type=int, default=1000)
+    import_parser.add_argument("--workers", type=int, default=None, help="Процессов для хэширования паролей")
+    import_parser.add_argument("--report", help="Файл для отчёта о конфликтах (JSONL), по умолчанию stderr")
+    import_parser.set_defaults(handler=import_users_command)
+
+    export_parser = commands.add_parser("export-users", help="Экспорт пользователей в CSV/JSONL")
+    export_parser.add_argument("path")
+    export_parser.add_argument("--format", choices=["csv", "jsonl"])
+    export_parser.add_argument("--batch-size", type=int, default=1000)
+    export_parser.add_argument("--include-password-hash", action="store_true",
+                               help="Добавить хэши паролей (для переноса между инсталляциями)")
+    export_parser.set_defaults(handler=export_users_command)
+
+    key_parser = commands.add_parser("generate-signing-key", help="Новый ключ подписи токенов для JWT_KEYS_DIR")
+    key_parser.add_argument("directory")
+    key_parser.add_argument("--algorithm", choices=["RS256", "EdDSA"], default="RS256")
+    key_parser.add_argument("--kid", help="Идентификатор ключа, по умолчанию текущее время UTC")
+    key_parser.add_argument("--rsa-bits", type=int, default=2048)
+    key_parser.set_defaults(handler=generate_signing_key_command)
+
+    calibrate_parser = commands.add_parser("calibrate-hash", help="Подбор стоимости хэша под целевое время")
+    calibrate_parser.add_argument("--scheme", choices=["bcrypt", "argon2"], default=settings.PASSWORD_HASH_SCHEME)
+    calibrate_parser.add_argument("--target-ms", type=float, default=settings.PASSWORD_HASH_TARGET_MS)
+    calibrate_parser.add_argument("--memory-cost", type=int, default=settings.ARGON2_MEMORY_COST, help="argon2, КиБ")
+    calibrate_parser.add_argument("--parallelism", type=int, default=settings.ARGON2_PARALLELISM, help="argon2")
+    calibrate_parser.add_argument("--samples", type=int, default=5)
+    calibrate_parser.set_defaults(handler=calibrate_hash_command)
+
+    grant_parser = commands.add_parser("grant-permission",
+                                       help="Выдать право роли; новая роль получает и права по умолчанию")
+    grant_parser.add_argument("role")
+    grant_parser.add_argument("permission")
+    grant_parser.set_defaults(handler=grant_permission_command)
+
+    revoke_parser = commands.add_parser("revoke-permission", help="Отозвать право у роли")
+    revoke_parser.add_argument("role")
+    revoke_parser.add_argument("permission")
+    revoke_parser.set_defaults(handler=revoke_permission_command)
+
+    args = parser.parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
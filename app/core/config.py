@@ -9,15 +9,141 @@ class Settings(BaseSettings):
     POSTGRES_USER: str
     POSTGRES_PASSWORD: str = ""
     POSTGRES_DB: str = ""
+    # Полный URL базы вместо POSTGRES_* (например, sqlite+aiosqlite:///bench.db для бенчмарков)
+    DATABASE_URL: str | None = None
+    # Реплики только для чтения через запятую; пусто — всё идёт в основную БД
+    REPLICA_DATABASE_URLS: str = ""
+    # Сколько секунд после изменения данных клиент читает из основной БД (больше задержки репликации)
+    READ_YOUR_WRITES_SECONDS: int = 5
     SECRET_KEY: str = secrets.token_urlsafe(32)
     SECRET_KEY: str
     ALGORITHM: str
     ACCESS_TOKEN_EXPIRE_MINUTES: int
     GOOGLE_CLIENT_ID: str
     GOOGLE_CLIENT_SECRET: str
+    # Discovery-документ OpenID (для тестов и бенчмарков — адрес локальной заглушки)
+    GOOGLE_DISCOVERY_URL: str = "https://accounts.google.com/.well-known/openid-configuration"
+    # Метаданные и ключи провайдера загружаются при старте и обновляются в фоне
+    OIDC_METADATA_TTL_SECONDS: int = 3600
+    OIDC_FETCH_TIMEOUT_SECONDS: int = 10
+    # Время жизни сессионной куки с state/nonce входа через Google, с
+    OAUTH_SESSION_MAX_AGE_SECONDS: int = 600
+
+    # Схема хэширования паролей: "bcrypt" или "argon2" (argon2id) и её стоимость.
+    # Хэши другой схемы или стоимости пересчитываются при входе; подбор: python -m app.cli calibrate-hash
+    PASSWORD_HASH_SCHEME: str = "bcrypt"
+    BCRYPT_ROUNDS: int = 12
+    ARGON2_TIME_COST: int = 2
+    ARGON2_MEMORY_COST: int = 65536
+    ARGON2_PARALLELISM: int = 2
+    # Целевое время одной проверки пароля для calibrate-hash, мс
+    PASSWORD_HASH_TARGET_MS: int = 250
+
+    # Пул для хэширования паролей: "thread" или "process"
+    PASSWORD_HASH_EXECUTOR: str = "thread"
+    PASSWORD_HASH_WORKERS: int = 4
+    # Сколько задач может ждать в очереди сверх занятых воркеров, после чего отвечаем 503
+    PASSWORD_HASH_MAX_QUEUE: int = 32
+
+    # Пул соединений с базой данных
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: int = 30
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+
+    # Библиотека для JWT: "jose" (python-jose) или "pyjwt" (быстрее, нужна для EdDSA)
+    JWT_BACKEND: str = "jose"
+    # Закрытые ключи <kid>.pem для ALGORITHM=RS256/EdDSA и ключ, которым подписываются новые токены
+    JWT_KEYS_DIR: str | None = None
+    JWT_ACTIVE_KID: str | None = None
+    # Сколько секунд клиенты могут кэшировать /.well-known/jwks.json
+    JWKS_MAX_AGE_SECONDS: int = 300
+    # Кэш проверенных токенов (0 — отключить)
+    TOKEN_CACHE_SIZE: int = 10000
+    TOKEN_CACHE_TTL_SECONDS: int = 300
+
+    # Кэш id/username/роли пользователя в процессе (0 — отключить)
+    USER_CACHE_SIZE: int = 10000
+    USER_CACHE_TTL_SECONDS: int = 60
+
+    # Размер страницы поиска пользователей
+    SEARCH_PAGE_SIZE: int = 20
+    SEARCH_MAX_PAGE_SIZE: int = 100
+
+    # Размер страницы списков контактов и входящих запросов
+    CONTACTS_PAGE_SIZE: int = 100
+    CONTACTS_MAX_PAGE_SIZE: int = 1000
+    # Максимум имён в одном пакетном запросе добавления/удаления контактов
+    CONTACTS_BATCH_MAX_SIZE: int = 500
+
+    # Кэш id подтверждённых контактов по пользователям для общих контактов (0 — отключить)
+    CONTACT_GRAPH_CACHE_SIZE: int = 10000
+    CONTACT_GRAPH_CACHE_TTL_SECONDS: int = 60
+    # Рекомендации «возможно, вы знакомы»: размер ответа и сколько последних
+    # контактов пользователя учитывается, чтобы запрос не рос с длиной списка
+    CONTACT_SUGGESTIONS_LIMIT: int = 20
+    CONTACT_SUGGESTIONS_MAX_LIMIT: int = 100
+    CONTACT_SUGGESTIONS_MAX_FANOUT: int = 1000
+
+    # Тела ответов /user-info и /pending-requests по версии данных пользователя (0 — отключить)
+    RESPONSE_CACHE_SIZE: int = 10000
+    RESPONSE_CACHE_TTL_SECONDS: int = 300
+
+    # Как часто перечитывать карту прав ролей из БД
+    PERMISSIONS_REFRESH_SECONDS: int = 60
+
+    # Метрики Prometheus (/metrics)
+    METRICS_ENABLED: bool = True
+
+    # Ограничение частоты /login и /register: "memory" (в каждом воркере) или "redis" (общий лимит)
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_BACKEND: str = "memory"
+    RATE_LIMIT_WINDOW_SECONDS: int = 60
+    RATE_LIMIT_CACHE_SIZE: int = 100000
+    # Запросов за окно с одного IP и на одно имя пользователя
+    LOGIN_IP_LIMIT: int = 30
+    LOGIN_USERNAME_LIMIT: int = 10
+    REGISTER_IP_LIMIT: int = 10
+    REGISTER_USERNAME_LIMIT: int = 3
+
+    # Повторы /register с тем же Idempotency-Key: "memory" (в каждом воркере) или "redis"
+    IDEMPOTENCY_BACKEND: str = "memory"
+    # Сколько хранится результат и сколько ключ занят выполняющимся запросом, с
+    IDEMPOTENCY_TTL_SECONDS: int = 86400
+    IDEMPOTENCY_LOCK_SECONDS: int = 60
+    IDEMPOTENCY_CACHE_SIZE: int = 100000
+
+    # Хранилище refresh-токенов и отозванных jti: "memory" (один процесс) или "redis"
+    TOKEN_STORE: str = "memory"
+    REDIS_URL: str = "redis://localhost:6379/0"
+    REFRESH_TOKEN_EXPIRE_DAYS: int = 7
+    # Как часто подтягивать список отозванных токенов из хранилища в фильтр процесса
+    REVOCATION_SYNC_SECONDS: int = 5
+    REVOCATION_CACHE_SIZE: int = 10000
+
+    # Журнал входов, регистраций и изменений контактов: "database" (audit_events) или "jsonl"
+    AUDIT_ENABLED: bool = True
+    AUDIT_SINK: str = "database"
+    AUDIT_JSONL_PATH: str = "audit.jsonl"
+    # Очередь событий в памяти и запись пакетами
+    AUDIT_QUEUE_SIZE: int = 10000
+    AUDIT_BATCH_SIZE: int = 500
+    AUDIT_FLUSH_SECONDS: float = 1.0
+    # При заполненной очереди: "drop_new", "drop_oldest" или "block" (обработчик ждёт места)
+    AUDIT_OVERFLOW: str = "drop_new"
+    # Размер страницы /activity
+    ACTIVITY_PAGE_SIZE: int = 50
+    ACTIVITY_MAX_PAGE_SIZE: int = 200
+
+    @property
+    def replica_database_urls(self) -> list[str]:
+        return [url.strip() for url in self.REPLICA_DATABASE_URLS.split(",") if url.strip()]
 
     @property
     def SQLALCHEMY_DATABASE_URI(self) -> PostgresDsn:
+        if self.DATABASE_URL:
+            return self.DATABASE_URL
         return (f"postgresql+psycopg://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}"
                 f"@{self.POSTGRES_SERVER}:{self.POSTGRES_PORT}/{self.POSTGRES_DB}")
 
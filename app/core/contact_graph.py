@@ -0,0 +1,47 @@
+from app.core.cache import TTLCache
+from app.core.config import settings
+
+
+class ContactGraphCache:
+    """Список смежности: id подтверждённых контактов каждого пользователя.
+
+    Множество загружается при первом чтении и дальше обновляется на месте,
+    когда пара подтверждается или удаляется в этом процессе. Изменения из
+    других воркеров видны не позже CONTACT_GRAPH_CACHE_TTL_SECONDS.
+    Возвращаемые множества нельзя изменять: они общие для всех запросов.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    @property
+    def enabled(self) -> bool:
+        return self._cache.maxsize > 0
+
+    def get(self, user_id: int) -> set[int] | None:
+        return self._cache.get(user_id)
+
+    def set(self, user_id: int, contact_ids: set[int]) -> None:
+        self._cache.set(user_id, contact_ids)
+
+    # Обновляются только уже загруженные множества: неполное множество в кэш не попадает
+    def link(self, user_id: int, contact_id: int) -> None:
+        for owner, other in ((user_id, contact_id), (contact_id, user_id)):
+            contact_ids = self._cache.get(owner)
+            if contact_ids is not None:
+                contact_ids.add(other)
+
+    def unlink(self, user_id: int, contact_id: int) -> None:
+        for owner, other in ((user_id, contact_id), (contact_id, user_id)):
+            contact_ids = self._cache.get(owner)
+            if contact_ids is not None:
+                contact_ids.discard(other)
+
+    def remove_user(self, user_id: int) -> None:
+        for contact_id in self._cache.pop(user_id) or ():
+            self.unlink(contact_id, user_id)
+
+
+contact_graph = ContactGraphCache(
+    maxsize=settings.CONTACT_GRAPH_CACHE_SIZE, ttl=settings.CONTACT_GRAPH_CACHE_TTL_SECONDS,
+)
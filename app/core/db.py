@@ -1,10 +1,115 @@
-from sqlalchemy import create_engine
+import itertools
+from sqlalchemy import Engine, create_engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
+from app.core.metrics import instrument_engine, timed_pool_class
 
 DATABASE_URL = settings.SQLALCHEMY_DATABASE_URI
 
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Общие настройки пула для синхронного и асинхронного движков.
+# SQLite (бенчмарки, локальный запуск) использует свой пул без размера и overflow.
+def engine_options(url) -> dict:
+    options = {
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+    if make_url(url).get_backend_name() != "sqlite":
+        options.update(
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+        )
+    return options
+
+
+# Синхронный драйвер для того же URL (aiosqlite работает только в asyncio)
+def sync_database_url(url: str):
+    url = make_url(url)
+    if url.drivername == "sqlite+aiosqlite":
+        return url.set(drivername="sqlite")
+    return url
+
+
+# Синхронный движок для миграций и консольных утилит; создаётся только там, где нужен
+def create_sync_engine(url: str = DATABASE_URL) -> Engine:
+    return create_engine(sync_database_url(url), **engine_options(url))
+
+
+# Асинхронный движок (psycopg 3) для обработчиков запросов создаётся в lifespan,
+# поэтому импорт модуля не загружает драйвер и не открывает пул
+async_engine: AsyncEngine | None = None
+AsyncSessionLocal = async_sessionmaker(autoflush=False, expire_on_commit=False)
+
+# Реплики только для чтения (REPLICA_DATABASE_URLS); без них чтение идёт в основную БД
+replica_engines: list[AsyncEngine] = []
+_replica_sessions: list[async_sessionmaker] = []
+_replica_cycle = itertools.cycle([])
+
+
+# Асинхронный движок; с метриками пул того класса, что выбрал диалект, меряет ожидание соединения
+def _create_async_engine(url: str, name: str) -> AsyncEngine:
+    options = engine_options(url)
+    if not settings.METRICS_ENABLED:
+        return create_async_engine(url, **options)
+    # Тот же класс пула, что create_async_engine выбрал бы сам по асинхронному диалекту
+    parsed = make_url(url)
+    pool_class = parsed.get_dialect().get_async_dialect_cls(parsed).get_pool_class(parsed)
+    engine = create_async_engine(url, poolclass=timed_pool_class(pool_class, name), **options)
+    capacity = options["pool_size"] + options["max_overflow"] if "pool_size" in options else None
+    instrument_engine(engine.sync_engine, name, capacity)
+    return engine
+
+
+def init_async_engine(url: str = DATABASE_URL) -> AsyncEngine:
+    """Создаёт движки и привязывает к ним фабрики сессий; повторный вызов ничего не делает."""
+    global async_engine, _replica_cycle
+    if async_engine is None:
+        async_engine = _create_async_engine(url, "async")
+        AsyncSessionLocal.configure(bind=async_engine)
+        for number, replica_url in enumerate(settings.replica_database_urls):
+            replica = _create_async_engine(replica_url, f"replica{number}")
+            replica_engines.append(replica)
+            _replica_sessions.append(async_sessionmaker(replica, autoflush=False, expire_on_commit=False))
+        _replica_cycle = itertools.cycle(_replica_sessions)
+    return async_engine
+
+
+async def dispose_async_engine() -> None:
+    global async_engine, _replica_cycle
+    if async_engine is not None:
+        await async_engine.dispose()
+        async_engine = None
+    for replica in replica_engines:
+        await replica.dispose()
+    replica_engines.clear()
+    _replica_sessions.clear()
+    _replica_cycle = itertools.cycle([])
+
+
+def read_session(use_primary: bool = False) -> AsyncSession:
+    """Сессия для запросов только на чтение: реплики по кругу или основная БД."""
+    if use_primary or not _replica_sessions:
+        return AsyncSessionLocal()
+    return next(_replica_cycle)()
+
+
 Base = declarative_base()
+
+
+# Dependency для получения асинхронной сессии базы данных
+async def get_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+# INSERT с поддержкой ON CONFLICT для диалекта текущего подключения
+def dialect_insert(dialect_name: str, table):
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect_name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f"ON CONFLICT is not supported for {dialect_name}")
+    return insert(table)
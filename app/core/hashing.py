@@ -0,0 +1,83 @@
+import asyncio
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from fastapi import HTTPException, status
+from app.core.config import settings
+from app.core.metrics import password_hash_duration, password_hash_pending
+from app.core.security import hash_password, verify_and_update_password, verify_password
+
+
+class PasswordHasher:
+    """Выполняет хэширование паролей в отдельном пуле, чтобы не блокировать event loop.
+
+    Количество одновременно принятых задач ограничено: воркеры плюс очередь.
+    Если лимит исчерпан, запрос сразу получает 503 вместо ожидания.
+    """
+
+    def __init__(self, executor_kind: str, max_workers: int, max_queue: int):
+        if executor_kind not in ("thread", "process"):
+            raise ValueError(f"Unknown password hash executor: {executor_kind}")
+        self.executor_kind = executor_kind
+        self.max_workers = max_workers
+        self.max_pending = max_workers + max_queue
+        self._pending = 0
+        self._executor: Executor | None = None
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def _get_executor(self) -> Executor:
+        # Пул создаётся лениво, уже внутри рабочего процесса
+        if self._executor is None:
+            if self.executor_kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="password-hasher"
+                )
+        return self._executor
+
+    async def _run(self, operation: str, func, *args):
+        # Счётчик меняется только из event loop, поэтому блокировка не нужна
+        if self._pending >= self.max_pending:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Password hashing service is busy, try again later",
+                headers={"Retry-After": "1"},
+            )
+        self._pending += 1
+        password_hash_pending.inc()
+        started = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), func, *args)
+        finally:
+            self._pending -= 1
+            password_hash_pending.dec()
+            password_hash_duration.labels(operation).observe(time.perf_counter() - started)
+
+    async def hash(self, password: str) -> str:
+        """Хэширует пароль в пуле."""
+        return await self._run("hash", hash_password, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        """Проверяет пароль в пуле."""
+        return await self._run("verify", verify_password, plain_password, hashed_password)
+
+    async def verify_and_update(self, plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+        """Проверяет пароль в пуле и пересчитывает хэш, если он ниже политики."""
+        return await self._run("verify", verify_and_update_password, plain_password, hashed_password)
+
+    async def shutdown(self) -> None:
+        # Ожидание завершения пула уносится в поток, чтобы не останавливать event loop
+        if self._executor is not None:
+            executor, self._executor = self._executor, None
+            await asyncio.to_thread(executor.shutdown, wait=True, cancel_futures=True)
+
+
+password_hasher = PasswordHasher(
+    executor_kind=settings.PASSWORD_HASH_EXECUTOR,
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    max_queue=settings.PASSWORD_HASH_MAX_QUEUE,
+)
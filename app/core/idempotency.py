@@ -0,0 +1,99 @@
+import json
+from abc import ABC, abstractmethod
+from app.core.cache import TTLCache
+from app.core.config import settings
+
+# Запрос с этим ключом ещё выполняется
+IN_PROGRESS = "in_progress"
+COMPLETED = "completed"
+
+
+class IdempotencyStore(ABC):
+    """Результаты запросов по заголовку Idempotency-Key.
+
+    claim атомарно занимает ключ и возвращает None. Если ключ уже занят, claim
+    возвращает сохранённую запись: {"state", "fingerprint", ...}. Завершённый
+    запрос сохраняется через complete. Если запрос упал, release освобождает ключ
+    для повтора.
+    """
+
+    @abstractmethod
+    async def claim(self, key: str, fingerprint: str, ttl: int) -> dict | None:
+        ...
+
+    @abstractmethod
+    async def complete(self, key: str, record: dict, ttl: int) -> None:
+        ...
+
+    @abstractmethod
+    async def release(self, key: str) -> None:
+        ...
+
+    async def close(self) -> None:
+        pass
+
+
+class MemoryIdempotencyStore(IdempotencyStore):
+    """Ключи в памяти процесса: повтор, попавший в другой воркер, выполнится заново."""
+
+    def __init__(self, maxsize: int, ttl: int):
+        self._records = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    async def claim(self, key: str, fingerprint: str, ttl: int) -> dict | None:
+        # Между get и set нет await, поэтому проверка и захват атомарны в event loop
+        record = self._records.get(key)
+        if record is not None:
+            return record
+        self._records.set(key, {"state": IN_PROGRESS, "fingerprint": fingerprint}, ttl=ttl)
+        return None
+
+    async def complete(self, key: str, record: dict, ttl: int) -> None:
+        self._records.set(key, {**record, "state": COMPLETED}, ttl=ttl)
+
+    async def release(self, key: str) -> None:
+        self._records.pop(key)
+
+
+class RedisIdempotencyStore(IdempotencyStore):
+    """Ключи в Redis, общие для всех воркеров: SET NX занимает ключ."""
+
+    def __init__(self, client, prefix: str = "idempotency:"):
+        self._redis = client
+        self._prefix = prefix
+
+    @classmethod
+    def from_url(cls, url: str) -> "RedisIdempotencyStore":
+        from redis.asyncio import Redis
+
+        return cls(Redis.from_url(url, decode_responses=True))
+
+    async def claim(self, key: str, fingerprint: str, ttl: int) -> dict | None:
+        key = self._prefix + key
+        value = json.dumps({"state": IN_PROGRESS, "fingerprint": fingerprint})
+        if await self._redis.set(key, value, nx=True, ex=ttl):
+            return None
+        existing = await self._redis.get(key)
+        # Ключ мог истечь между SET и GET — тогда занимаем его заново
+        if existing is None:
+            return await self.claim(key.removeprefix(self._prefix), fingerprint, ttl)
+        return json.loads(existing)
+
+    async def complete(self, key: str, record: dict, ttl: int) -> None:
+        await self._redis.set(self._prefix + key, json.dumps({**record, "state": COMPLETED}), ex=ttl)
+
+    async def release(self, key: str) -> None:
+        await self._redis.delete(self._prefix + key)
+
+    async def close(self) -> None:
+        await self._redis.aclose()
+
+
+def _create_idempotency_store() -> IdempotencyStore:
+    if settings.IDEMPOTENCY_BACKEND == "redis":
+        return RedisIdempotencyStore.from_url(settings.REDIS_URL)
+    if settings.IDEMPOTENCY_BACKEND == "memory":
+        return MemoryIdempotencyStore(maxsize=settings.IDEMPOTENCY_CACHE_SIZE, ttl=settings.IDEMPOTENCY_TTL_SECONDS)
+    raise ValueError(f"Unknown idempotency backend: {settings.IDEMPOTENCY_BACKEND}")
+
+
+idempotency_store = _create_idempotency_store()
@@ -0,0 +1,136 @@
+import asyncio
+import os
+import time
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client import multiprocess
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import Pool
+from starlette.requests import Request
+from starlette.responses import Response
+
+# Границы для быстрых операций (JWT, запросы к БД, ожидание пула)
+FAST_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+http_request_duration = Histogram(
+    "http_request_duration_seconds", "Время обработки HTTP-запроса", ["method", "route", "status"],
+)
+password_hash_duration = Histogram(
+    "password_hash_duration_seconds", "Хэширование и проверка паролей, включая ожидание в очереди пула",
+    ["operation"], buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+# Gauge меняются только через inc/dec/set: при нескольких воркерах (PROMETHEUS_MULTIPROC_DIR)
+# значения живых процессов суммируются, set_function там не работает
+password_hash_pending = Gauge(
+    "password_hash_pending", "Задач в пуле хэширования паролей", multiprocess_mode="livesum",
+)
+jwt_duration = Histogram("jwt_duration_seconds", "Создание и проверка JWT", ["operation"], buckets=FAST_BUCKETS)
+jwt_cache_hits = Counter("jwt_claims_cache_hits_total", "Проверки JWT, обслуженные из кэша")
+db_query_duration = Histogram("db_query_duration_seconds", "Время выполнения SQL-запросов", buckets=FAST_BUCKETS)
+db_pool_wait = Histogram(
+    "db_pool_checkout_wait_seconds", "Получение соединения из пула: ожидание свободного или открытие нового",
+    ["engine"], buckets=FAST_BUCKETS,
+)
+db_pool_checked_out = Gauge(
+    "db_pool_checked_out", "Соединений, выданных из пула", ["engine"], multiprocess_mode="livesum",
+)
+db_pool_capacity = Gauge(
+    "db_pool_capacity", "Максимум соединений пула (size + max_overflow)", ["engine"], multiprocess_mode="livesum",
+)
+rate_limited = Counter("rate_limited_total", "Запросы, отклонённые ограничением частоты", ["scope"])
+audit_events = Counter("audit_events_total", "События журнала: записанные, отброшенные, потерянные при сбое", ["result"])
+google_oauth_duration = Histogram(
+    "google_oauth_duration_seconds", "Обмен кода на токен у Google (полный round-trip)",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+
+
+class MetricsMiddleware:
+    """ASGI-middleware: гистограмма задержек по шаблону маршрута.
+
+    Метка route берётся из шаблона пути (/user-info, а не полного URL),
+    поэтому число временных рядов не зависит от параметров запроса.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            http_request_duration.labels(
+                scope["method"], getattr(route, "path", "unmatched"), str(status_code)
+            ).observe(time.perf_counter() - started)
+
+
+def timed_pool_class(pool_class: type[Pool], name: str) -> type[Pool]:
+    """Подкласс пула, который меряет время Pool.connect() с меткой engine=name.
+
+    Событий начала ожидания в пуле нет, поэтому замер делается в подклассе.
+    Метка хранится в классе и переживает пересоздание пула в dispose().
+    """
+
+    class TimedPool(pool_class):
+        def connect(self):
+            started = time.perf_counter()
+            try:
+                return super().connect()
+            finally:
+                db_pool_wait.labels(name).observe(time.perf_counter() - started)
+
+    TimedPool.__name__ = TimedPool.__qualname__ = f"Timed{pool_class.__name__}"
+    return TimedPool
+
+
+def instrument_engine(engine: Engine, name: str, capacity: int | None = None) -> None:
+    """Время SQL-запросов и заполненность пула движка; ожидание пула меряет timed_pool_class."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        db_query_duration.observe(time.perf_counter() - conn.info["query_started"].pop())
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(context):
+        if context.connection is not None and context.connection.info.get("query_started"):
+            context.connection.info["query_started"].pop()
+
+    checked_out = db_pool_checked_out.labels(name)
+
+    @event.listens_for(engine, "checkout")
+    def checkout(dbapi_connection, connection_record, connection_proxy):
+        checked_out.inc()
+
+    @event.listens_for(engine, "checkin")
+    def checkin(dbapi_connection, connection_record):
+        checked_out.dec()
+
+    if capacity is not None:
+        db_pool_capacity.labels(name).set(capacity)
+
+
+async def metrics_endpoint(request: Request) -> Response:
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+    # Под gunicorn метрики всех воркеров собираются из файлов; чтение файлов — в потоке
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return Response(await asyncio.to_thread(generate_latest, registry), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,20 @@
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+
+class PathScopedMiddleware:
+    """Включает middleware только для запросов с заданными префиксами пути.
+
+    Остальные запросы идут сразу во внутреннее приложение и не платят
+    за работу middleware.
+    """
+
+    def __init__(self, app: ASGIApp, middleware: type, prefixes: tuple[str, ...], **options):
+        self.app = app
+        self.scoped = middleware(app, **options)
+        self.prefixes = tuple(prefixes)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] in ("http", "websocket") and scope["path"].startswith(self.prefixes):
+            await self.scoped(scope, receive, send)
+        else:
+            await self.app(scope, receive, send)
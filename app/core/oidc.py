@@ -0,0 +1,54 @@
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class ProviderMetadataCache:
+    """Предзагрузка discovery-документа и JWKS OpenID-провайдера.
+
+    Authlib загружает метаданные и ключи при первом запросе и потом держит их
+    бессрочно. Здесь они загружаются при старте и обновляются в фоне раз в ttl
+    секунд, поэтому callback делает только обмен кода на токен, а ID-токен
+    проверяется по ключам в памяти. Незнакомый kid authlib сам перезагружает.
+    """
+
+    def __init__(self, client, ttl: float, timeout: float):
+        self._client = client
+        self._ttl = ttl
+        self._timeout = timeout
+        self._task: asyncio.Task | None = None
+        self.loaded_at: float | None = None
+
+    async def refresh(self) -> None:
+        # Без _loaded_at authlib заново скачивает discovery-документ; update не стирает старые значения
+        self._client.server_metadata.pop("_loaded_at", None)
+        await self._client.load_server_metadata()
+        await self._client.fetch_jwk_set(force=True)
+        self.loaded_at = time.time()
+
+    async def _refresh_forever(self) -> None:
+        delay = self._ttl
+        while True:
+            await asyncio.sleep(delay)
+            try:
+                await asyncio.wait_for(self.refresh(), self._timeout)
+                delay = self._ttl
+            except Exception:
+                # Остаются прежние метаданные; повторяем раньше, чем через полный ttl
+                logger.exception("Failed to refresh OpenID provider metadata")
+                delay = min(self._ttl, 60)
+
+    async def start(self) -> None:
+        try:
+            await asyncio.wait_for(self.refresh(), self._timeout)
+        except Exception:
+            # Сервис стартует и без провайдера; метаданные загрузятся при первом входе
+            logger.exception("Failed to prefetch OpenID provider metadata")
+        self._task = asyncio.create_task(self._refresh_forever())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
@@ -0,0 +1,98 @@
+import math
+import secrets
+import time
+from abc import ABC, abstractmethod
+from app.core.cache import TTLCache
+from app.core.config import settings
+
+
+class RateLimiter(ABC):
+    """Ограничение частоты запросов по ключу: не больше limit за window секунд.
+
+    hit возвращает 0, если запрос разрешён, иначе сколько секунд подождать.
+    """
+
+    @abstractmethod
+    async def hit(self, key: str, limit: int, window: int) -> float:
+        ...
+
+    async def close(self) -> None:
+        pass
+
+
+class MemoryRateLimiter(RateLimiter):
+    """Token bucket в памяти процесса: лимит действует отдельно в каждом воркере."""
+
+    def __init__(self, maxsize: int, max_window: int):
+        # Через window секунд корзина снова полная, поэтому запись можно забыть
+        self._buckets = TTLCache(maxsize=maxsize, ttl=max_window)
+
+    async def hit(self, key: str, limit: int, window: int) -> float:
+        now = time.monotonic()
+        rate = limit / window
+        tokens, updated = self._buckets.get(key) or (limit, now)
+        tokens = min(limit, tokens + (now - updated) * rate)
+        if tokens < 1:
+            self._buckets.set(key, (tokens, now), ttl=window)
+            return (1 - tokens) / rate
+        self._buckets.set(key, (tokens - 1, now), ttl=window)
+        return 0
+
+
+class RedisRateLimiter(RateLimiter):
+    """Скользящее окно в Redis (sorted set времён запросов), общее для всех воркеров.
+
+    Проверка и запись выполняются одним Lua-скриптом, поэтому параллельные
+    запросы из разных воркеров не проходят сверх лимита. Отклонённые запросы
+    в окно не записываются, поэтому поток отказов не раздувает ключ.
+    """
+
+    # Возвращает строку: Redis обрезает дробные числа из Lua до целых
+    HIT_SCRIPT = """
+    local key, now, window, limit = KEYS[1], tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+    redis.call("ZREMRANGEBYSCORE", key, "-inf", now - window)
+    if redis.call("ZCARD", key) >= limit then
+        local oldest = redis.call("ZRANGE", key, 0, 0, "WITHSCORES")
+        if oldest[2] then
+            return tostring(math.max(tonumber(oldest[2]) + window - now, 0.001))
+        end
+        return tostring(window)
+    end
+    redis.call("ZADD", key, now, ARGV[4])
+    redis.call("EXPIRE", key, window)
+    return "0"
+    """
+
+    def __init__(self, client, prefix: str = "ratelimit:"):
+        self._redis = client
+        self._prefix = prefix
+        self._hit = client.register_script(self.HIT_SCRIPT)
+
+    @classmethod
+    def from_url(cls, url: str) -> "RedisRateLimiter":
+        from redis.asyncio import Redis
+
+        return cls(Redis.from_url(url, decode_responses=True))
+
+    async def hit(self, key: str, limit: int, window: int) -> float:
+        now = time.time()
+        wait = await self._hit(keys=[self._prefix + key], args=[now, window, limit, f"{now}:{secrets.token_hex(4)}"])
+        return float(wait)
+
+    async def close(self) -> None:
+        await self._redis.aclose()
+
+
+def retry_after(seconds: float) -> str:
+    return str(max(1, math.ceil(seconds)))
+
+
+def _create_rate_limiter() -> RateLimiter:
+    if settings.RATE_LIMIT_BACKEND == "redis":
+        return RedisRateLimiter.from_url(settings.REDIS_URL)
+    if settings.RATE_LIMIT_BACKEND == "memory":
+        return MemoryRateLimiter(maxsize=settings.RATE_LIMIT_CACHE_SIZE, max_window=settings.RATE_LIMIT_WINDOW_SECONDS)
+    raise ValueError(f"Unknown rate limit backend: {settings.RATE_LIMIT_BACKEND}")
+
+
+rate_limiter = _create_rate_limiter()
@@ -0,0 +1,42 @@
+from starlette.requests import Request
+from app.core.cache import TTLCache
+from app.core.config import settings
+
+
+def make_etag(user_id: int, version: int) -> str:
+    """Сильный ETag ответа, который зависит только от данных одного пользователя."""
+    return f'"{user_id}-{version}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Совпадает ли ETag с одним из значений If-None-Match (слабое сравнение)."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return etag in (value.strip().removeprefix("W/") for value in header.split(","))
+
+
+class ResponseCache:
+    """Готовые тела ответов по (адрес запроса, пользователь, версия данных).
+
+    Запись с устаревшей версией больше не запрашивается и вытесняется LRU или по TTL,
+    поэтому явная инвалидация не нужна.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    @staticmethod
+    def key(request: Request, user_id: int, version: int) -> tuple:
+        return request.url.path, str(request.query_params), user_id, version
+
+    def get(self, key: tuple) -> bytes | None:
+        return self._cache.get(key)
+
+    def set(self, key: tuple, body: bytes) -> None:
+        self._cache.set(key, body)
+
+
+response_cache = ResponseCache(maxsize=settings.RESPONSE_CACHE_SIZE, ttl=settings.RESPONSE_CACHE_TTL_SECONDS)
@@ -1,7 +1,16 @@
-from jose import JWTError, jwt
+import base64
+import hashlib
+import json
+import secrets
+import time
+from functools import cached_property
+from pathlib import Path
+from typing import Callable, NamedTuple
 from passlib.context import CryptContext
 from datetime import datetime, timedelta
+from app.core.cache import TTLCache
 from app.core.config import settings
+from app.core.metrics import jwt_cache_hits, jwt_duration
 
 
 # Настройки из .env
@@ -9,8 +18,164 @@ SECRET_KEY = settings.SECRET_KEY
 ALGORITHM = settings.ALGORITHM
 ACCESS_TOKEN_EXPIRE_MINUTES = settings.ACCESS_TOKEN_EXPIRE_MINUTES
 
+PASSWORD_HASH_SCHEMES = ("bcrypt", "argon2")
+
+
+def build_password_context(
+    scheme: str, bcrypt_rounds: int, argon2_time_cost: int, argon2_memory_cost: int, argon2_parallelism: int,
+) -> CryptContext:
+    """Политика хэширования паролей.
+
+    Новые хэши создаются схемой scheme с заданной стоимостью. Хэши другой схемы
+    или с другой стоимостью (в обе стороны) проверяются, но помечаются
+    устаревшими и пересчитываются при входе через verify_and_update.
+    """
+    if scheme not in PASSWORD_HASH_SCHEMES:
+        raise ValueError(f"Unknown password hash scheme: {scheme}")
+    return CryptContext(
+        schemes=[scheme] + [name for name in PASSWORD_HASH_SCHEMES if name != scheme],
+        default=scheme,
+        deprecated="auto",
+        bcrypt__rounds=bcrypt_rounds,
+        bcrypt__min_rounds=bcrypt_rounds,
+        bcrypt__max_rounds=bcrypt_rounds,
+        argon2__type="ID",
+        argon2__rounds=argon2_time_cost,
+        argon2__min_rounds=argon2_time_cost,
+        argon2__max_rounds=argon2_time_cost,
+        argon2__memory_cost=argon2_memory_cost,
+        argon2__parallelism=argon2_parallelism,
+    )
+
+
 # Настройки хэширования паролей
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = build_password_context(
+    settings.PASSWORD_HASH_SCHEME,
+    bcrypt_rounds=settings.BCRYPT_ROUNDS,
+    argon2_time_cost=settings.ARGON2_TIME_COST,
+    argon2_memory_cost=settings.ARGON2_MEMORY_COST,
+    argon2_parallelism=settings.ARGON2_PARALLELISM,
+)
+
+
+class JWTBackend(NamedTuple):
+    name: str
+    encode: Callable
+    decode: Callable
+    header: Callable
+    error: type[Exception]
+
+
+def load_jwt_backend(name: str) -> JWTBackend:
+    """Возвращает реализацию JWT; у обеих библиотек одинаковые encode/decode."""
+    # Библиотека импортируется только выбранная
+    if name == "jose":
+        from jose import JWTError, jwt
+
+        return JWTBackend("jose", jwt.encode, jwt.decode, jwt.get_unverified_header, JWTError)
+    if name == "pyjwt":
+        import jwt as pyjwt
+
+        return JWTBackend("pyjwt", pyjwt.encode, pyjwt.decode, pyjwt.get_unverified_header, pyjwt.PyJWTError)
+    raise ValueError(f"Unknown JWT backend: {name}")
+
+
+jwt_backend = load_jwt_backend(settings.JWT_BACKEND)
+
+ASYMMETRIC_ALGORITHMS = ("RS256", "EdDSA")
+
+
+def _b64url(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _int_b64url(value: int) -> str:
+    return _b64url(value.to_bytes((value.bit_length() + 7) // 8, "big"))
+
+
+class SigningKey(NamedTuple):
+    kid: str
+    algorithm: str
+    private_pem: str
+    public_pem: str
+    jwk: dict
+
+
+def load_signing_key(path: Path, algorithm: str) -> SigningKey:
+    """Читает закрытый ключ PEM; kid — имя файла без расширения."""
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import ed25519, rsa
+
+    private_pem = path.read_bytes()
+    public_key = serialization.load_pem_private_key(private_pem, password=None).public_key()
+    kid = path.stem
+    if algorithm == "RS256" and isinstance(public_key, rsa.RSAPublicKey):
+        numbers = public_key.public_numbers()
+        jwk = {"kty": "RSA", "n": _int_b64url(numbers.n), "e": _int_b64url(numbers.e)}
+    elif algorithm == "EdDSA" and isinstance(public_key, ed25519.Ed25519PublicKey):
+        raw = public_key.public_bytes(serialization.Encoding.Raw, serialization.PublicFormat.Raw)
+        jwk = {"kty": "OKP", "crv": "Ed25519", "x": _b64url(raw)}
+    else:
+        raise ValueError(f"Key {path} does not match algorithm {algorithm}")
+    jwk.update({"kid": kid, "alg": algorithm, "use": "sig"})
+    public_pem = public_key.public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    ).decode()
+    return SigningKey(kid, algorithm, private_pem.decode(), public_pem, jwk)
+
+
+class KeyRing:
+    """Ключи подписи токенов.
+
+    Для HS* используется SECRET_KEY, как раньше. Для RS256/EdDSA все *.pem из
+    JWT_KEYS_DIR публикуются в JWKS, а подписывает активный ключ (JWT_ACTIVE_KID
+    или последний по имени файла). Ротация: добавить новый файл и сделать его
+    активным, старый удалить после истечения выданных им токенов.
+    """
+
+    def __init__(self, algorithm: str, keys_dir: str | None = None, active_kid: str | None = None):
+        self.algorithm = algorithm
+        self.keys: dict[str, SigningKey] = {}
+        self.active: SigningKey | None = None
+        if algorithm not in ASYMMETRIC_ALGORITHMS:
+            return
+        if algorithm == "EdDSA" and jwt_backend.name == "jose":
+            raise ValueError("EdDSA requires JWT_BACKEND=pyjwt")
+        if not keys_dir:
+            raise ValueError(f"JWT_KEYS_DIR is required for {algorithm}")
+        for path in sorted(Path(keys_dir).glob("*.pem")):
+            key = load_signing_key(path, algorithm)
+            self.keys[key.kid] = key
+        if not self.keys:
+            raise ValueError(f"No signing keys found in {keys_dir}")
+        self.active = self.keys[active_kid] if active_kid else list(self.keys.values())[-1]
+
+    def sign(self, claims: dict) -> str:
+        if self.active is None:
+            return jwt_backend.encode(claims, SECRET_KEY, algorithm=self.algorithm)
+        return jwt_backend.encode(
+            claims, self.active.private_pem, algorithm=self.algorithm, headers={"kid": self.active.kid}
+        )
+
+    def verify(self, token: str) -> dict:
+        if self.active is None:
+            return jwt_backend.decode(token, SECRET_KEY, algorithms=[self.algorithm])
+        key = self.keys.get(jwt_backend.header(token).get("kid"))
+        if key is None:
+            raise jwt_backend.error("Unknown key id")
+        return jwt_backend.decode(token, key.public_pem, algorithms=[self.algorithm])
+
+    @cached_property
+    def jwks(self) -> tuple[bytes, str]:
+        """Тело /.well-known/jwks.json и его ETag; считаются один раз."""
+        body = json.dumps({"keys": [key.jwk for key in self.keys.values()]}, separators=(",", ":")).encode()
+        return body, '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+key_ring = KeyRing(ALGORITHM, settings.JWT_KEYS_DIR, settings.JWT_ACTIVE_KID)
+
+# Кэш уже проверенных токенов: ключ — sha256 токена, запись живёт не дольше exp
+claims_cache = TTLCache(maxsize=settings.TOKEN_CACHE_SIZE, ttl=settings.TOKEN_CACHE_TTL_SECONDS)
 
 
 def hash_password(password: str) -> str:
@@ -23,22 +188,68 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+def verify_and_update_password(plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+    """Проверяет пароль; второй элемент — новый хэш, если старый не соответствует политике."""
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
 def create_access_token(data: dict, expires_delta: timedelta | None = None) -> str:
-    """Создаёт JWT токен."""
+    """Создаёт JWT токен; jti нужен для отзыва конкретного токена.
+
+    Токен уходит в куке с каждым запросом, поэтому 64 бит случайности в jti
+    достаточно: он уникален только в пределах срока жизни токена.
+    """
     to_encode = data.copy()
     expire = datetime.utcnow() + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
     to_encode.update({"exp": expire})
-    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    to_encode.setdefault("jti", secrets.token_urlsafe(8))
+    with jwt_duration.labels("encode").time():
+        return key_ring.sign(to_encode)
 
 
 def decode_access_token(token: str) -> dict | None:
-    """Декодирует JWT токен."""
+    """Декодирует JWT токен, повторные проверки берутся из кэша."""
+    key = hashlib.sha256(token.encode()).digest()
+    payload = claims_cache.get(key)
+    if payload is not None:
+        jwt_cache_hits.inc()
+        return dict(payload)
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
-    except JWTError:
+        with jwt_duration.labels("decode").time():
+            payload = key_ring.verify(token)
+    except jwt_backend.error:
         return None
+    exp = payload.get("exp")
+    if exp is not None:
+        claims_cache.set(key, payload, ttl=exp - time.time())
+    return dict(payload)
 
 
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
+
+
+class JWKSVerifier:
+    """Проверка токенов сервиса в других сервисах без обращений к нему.
+
+    Набор ключей скачивается с /.well-known/jwks.json и кэшируется на lifespan
+    секунд; незнакомый kid (после ротации) вызывает повторную загрузку.
+    Загрузка синхронная, в async-коде её стоит выполнять в пуле потоков.
+
+        verifier = JWKSVerifier("https://auth.example.com/.well-known/jwks.json")
+        claims = verifier.verify(token)
+    """
+
+    def __init__(self, jwks_url: str, algorithms: tuple[str, ...] = ASYMMETRIC_ALGORITHMS, lifespan: int = 300):
+        import jwt as pyjwt
+
+        self._jwt = pyjwt
+        self._client = pyjwt.PyJWKClient(jwks_url, cache_keys=True, lifespan=lifespan)
+        self._algorithms = list(algorithms)
+
+    def verify(self, token: str) -> dict | None:
+        try:
+            signing_key = self._client.get_signing_key_from_jwt(token)
+            return self._jwt.decode(token, signing_key.key, algorithms=self._algorithms)
+        except self._jwt.PyJWTError:
+            return None
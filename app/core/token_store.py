@@ -0,0 +1,278 @@
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import secrets
+import time
+from abc import ABC, abstractmethod
+from datetime import timedelta
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.security import create_access_token, decode_access_token
+
+logger = logging.getLogger(__name__)
+
+REFRESH_TOKEN_TYPE = "refresh"
+
+
+class TokenStore(ABC):
+    """Хранилище refresh-токенов и отозванных jti.
+
+    Refresh-токен одноразовый: consume_refresh атомарно удаляет запись.
+    Цепочка токенов одной сессии (family) хранит id текущего действующего токена.
+    """
+
+    @abstractmethod
+    async def save_refresh(self, jti: str, family: str, subject: str, ttl: int) -> None:
+        ...
+
+    @abstractmethod
+    async def consume_refresh(self, jti: str) -> dict | None:
+        ...
+
+    @abstractmethod
+    async def revoke_family(self, family: str) -> None:
+        ...
+
+    @abstractmethod
+    async def revoke(self, jti: str, ttl: int) -> None:
+        ...
+
+    @abstractmethod
+    async def is_revoked(self, jti: str) -> bool:
+        ...
+
+    @abstractmethod
+    async def revoked_ids(self) -> list[str]:
+        ...
+
+    async def close(self) -> None:
+        pass
+
+
+class MemoryTokenStore(TokenStore):
+    """Хранилище в памяти процесса. Подходит только для одного воркера."""
+
+    def __init__(self):
+        self._refresh: dict[str, tuple[dict, float]] = {}
+        self._families: dict[str, str] = {}
+        self._revoked: dict[str, float] = {}
+
+    def _prune(self) -> None:
+        now = time.time()
+        self._refresh = {jti: item for jti, item in self._refresh.items() if item[1] > now}
+        self._revoked = {jti: expires for jti, expires in self._revoked.items() if expires > now}
+        live = {record["family"] for record, _ in self._refresh.values()}
+        self._families = {family: jti for family, jti in self._families.items() if family in live}
+
+    async def save_refresh(self, jti: str, family: str, subject: str, ttl: int) -> None:
+        if len(self._refresh) > 10000:
+            self._prune()
+        self._refresh[jti] = ({"family": family, "sub": subject}, time.time() + ttl)
+        self._families[family] = jti
+
+    async def consume_refresh(self, jti: str) -> dict | None:
+        item = self._refresh.pop(jti, None)
+        if item is None or item[1] <= time.time():
+            return None
+        return item[0]
+
+    async def revoke_family(self, family: str) -> None:
+        jti = self._families.pop(family, None)
+        if jti:
+            self._refresh.pop(jti, None)
+
+    async def revoke(self, jti: str, ttl: int) -> None:
+        self._revoked[jti] = time.time() + ttl
+
+    async def is_revoked(self, jti: str) -> bool:
+        return self._revoked.get(jti, 0) > time.time()
+
+    async def revoked_ids(self) -> list[str]:
+        self._prune()
+        return list(self._revoked)
+
+
+class RedisTokenStore(TokenStore):
+    """Хранилище в Redis (или совместимом сервере), общее для всех воркеров."""
+
+    def __init__(self, client, prefix: str = "auth:"):
+        self._redis = client
+        self._prefix = prefix
+
+    @classmethod
+    def from_url(cls, url: str) -> "RedisTokenStore":
+        from redis.asyncio import Redis
+
+        return cls(Redis.from_url(url, decode_responses=True))
+
+    def _key(self, *parts: str) -> str:
+        return self._prefix + ":".join(parts)
+
+    async def save_refresh(self, jti: str, family: str, subject: str, ttl: int) -> None:
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.set(self._key("refresh", jti), json.dumps({"family": family, "sub": subject}), ex=ttl)
+            pipe.set(self._key("family", family), jti, ex=ttl)
+            await pipe.execute()
+
+    async def consume_refresh(self, jti: str) -> dict | None:
+        value = await self._redis.getdel(self._key("refresh", jti))
+        return json.loads(value) if value else None
+
+    async def revoke_family(self, family: str) -> None:
+        jti = await self._redis.getdel(self._key("family", family))
+        if jti:
+            await self._redis.delete(self._key("refresh", jti))
+
+    async def revoke(self, jti: str, ttl: int) -> None:
+        expires = time.time() + ttl
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.set(self._key("revoked", jti), 1, ex=ttl)
+            # Sorted set по времени истечения — для выгрузки списка при синхронизации
+            pipe.zadd(self._key("revoked"), {jti: expires})
+            await pipe.execute()
+
+    async def is_revoked(self, jti: str) -> bool:
+        return bool(await self._redis.exists(self._key("revoked", jti)))
+
+    async def revoked_ids(self) -> list[str]:
+        key = self._key("revoked")
+        await self._redis.zremrangebyscore(key, "-inf", time.time())
+        return await self._redis.zrange(key, 0, -1)
+
+    async def close(self) -> None:
+        await self._redis.aclose()
+
+
+class BloomFilter:
+    """Компактное множество без ложноотрицательных ответов."""
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        capacity = max(capacity, 1)
+        self._size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self._hashes = max(1, round(self._size / capacity * math.log(2)))
+        self._bits = bytearray((self._size + 7) // 8)
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], "big"), int.from_bytes(digest[8:], "big")
+        return ((first + i * second) % self._size for i in range(self._hashes))
+
+    def add(self, item: str) -> None:
+        for position in self._positions(item):
+            self._bits[position // 8] |= 1 << (position % 8)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[position // 8] & (1 << (position % 8)) for position in self._positions(item))
+
+
+class RevocationChecker:
+    """Проверка отзыва jti без сетевого запроса в обычном случае.
+
+    Список отозванных jti раз в REVOCATION_SYNC_SECONDS выгружается из хранилища
+    в bloom-фильтр. Если jti в фильтр не попал, токен не отозван. Положительный
+    ответ фильтра подтверждается в хранилище, результат кэшируется в LRU.
+    Отзывы из других воркеров становятся видны не позже следующей синхронизации.
+    """
+
+    def __init__(self, store: TokenStore, sync_seconds: float, cache_size: int):
+        self._store = store
+        self._sync_seconds = sync_seconds
+        self._bloom = BloomFilter(1024)
+        self._confirmed = TTLCache(maxsize=cache_size, ttl=sync_seconds)
+        self._task: asyncio.Task | None = None
+
+    async def sync(self) -> None:
+        revoked = await self._store.revoked_ids()
+        bloom = BloomFilter(max(1024, len(revoked) * 2))
+        for jti in revoked:
+            bloom.add(jti)
+        self._bloom = bloom
+        self._confirmed.clear()
+
+    async def _sync_forever(self) -> None:
+        while True:
+            await asyncio.sleep(self._sync_seconds)
+            try:
+                await self.sync()
+            except Exception:
+                logger.exception("Failed to sync revoked tokens")
+
+    async def start(self) -> None:
+        await self.sync()
+        self._task = asyncio.create_task(self._sync_forever())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def revoke(self, jti: str, ttl: int) -> None:
+        await self._store.revoke(jti, ttl)
+        self._bloom.add(jti)
+        self._confirmed.set(jti, True)
+
+    async def is_revoked(self, jti: str) -> bool:
+        if jti not in self._bloom:
+            return False
+        cached = self._confirmed.get(jti)
+        if cached is None:
+            cached = await self._store.is_revoked(jti)
+            self._confirmed.set(jti, cached)
+        return cached
+
+
+def _create_token_store() -> TokenStore:
+    if settings.TOKEN_STORE == "redis":
+        return RedisTokenStore.from_url(settings.REDIS_URL)
+    if settings.TOKEN_STORE == "memory":
+        return MemoryTokenStore()
+    raise ValueError(f"Unknown token store: {settings.TOKEN_STORE}")
+
+
+token_store = _create_token_store()
+revocation_checker = RevocationChecker(
+    token_store, sync_seconds=settings.REVOCATION_SYNC_SECONDS, cache_size=settings.REVOCATION_CACHE_SIZE,
+)
+
+
+async def issue_refresh_token(subject: str, family: str | None = None) -> tuple[str, str]:
+    """Создаёт одноразовый refresh-токен и возвращает (токен, family)."""
+    jti = secrets.token_urlsafe(16)
+    family = family or secrets.token_urlsafe(8)
+    ttl = timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+    token = create_access_token(
+        data={"sub": subject, "jti": jti, "fam": family, "type": REFRESH_TOKEN_TYPE}, expires_delta=ttl,
+    )
+    await token_store.save_refresh(jti, family, subject, int(ttl.total_seconds()))
+    return token, family
+
+
+async def rotate_refresh_token(token: str) -> tuple[str, str, str] | None:
+    """Обменивает refresh-токен на новый; возвращает (subject, новый токен, family).
+
+    Повторное предъявление уже использованного токена означает утечку:
+    вся цепочка family отзывается, пользователю нужно войти заново.
+    """
+    payload = decode_access_token(token)
+    if not payload or payload.get("type") != REFRESH_TOKEN_TYPE or "jti" not in payload:
+        return None
+    record = await token_store.consume_refresh(payload["jti"])
+    if record is None:
+        await token_store.revoke_family(payload["fam"])
+        return None
+    new_token, family = await issue_refresh_token(record["sub"], family=record["family"])
+    return record["sub"], new_token, family
+
+
+async def revoke_session(access_payload: dict) -> None:
+    """Отзывает access-токен до истечения и refresh-цепочку его сессии."""
+    jti = access_payload.get("jti")
+    if jti:
+        ttl = int(access_payload["exp"] - time.time()) + 1
+        if ttl > 0:
+            await revocation_checker.revoke(jti, ttl)
+    family = access_payload.get("fam")
+    if family:
+        await token_store.revoke_family(family)
@@ -0,0 +1,20 @@
+from dataclasses import dataclass
+from app.core.cache import TTLCache
+from app.core.config import settings
+
+
+@dataclass(frozen=True)
+class CachedUser:
+    """Минимальные данные о пользователе, нужные обработчикам запросов."""
+    id: int
+    username: str
+    role: str | None
+
+
+# Кэш по username. Инвалидируется в crud.update_user/delete_user текущего процесса,
+# в остальных воркерах устаревшая запись живёт не дольше USER_CACHE_TTL_SECONDS.
+user_cache = TTLCache(maxsize=settings.USER_CACHE_SIZE, ttl=settings.USER_CACHE_TTL_SECONDS)
+
+
+def invalidate_user(username: str) -> None:
+    user_cache.pop(username)
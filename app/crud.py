@@ -1,51 +1,500 @@
-from sqlalchemy.orm import Session
-from app.api.models import User
-from app.core.security import hash_password
+from bisect import bisect_right
+from sqlalchemy import and_, delete, exists, func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased, joinedload
+from app.api.models import AuditEvent, User, Contact
+from app.core.contact_graph import contact_graph
+from app.core.db import dialect_insert
+from app.core.hashing import password_hasher
+from app.core.user_cache import CachedUser, invalidate_user, user_cache
 
 
-# Создание нового пользователя
-def create_user(db: Session, username: str, email: str, password: str):
-    hashed_password = hash_password(password)
-    db_user = User(username=username, email=email, password=hashed_password)
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
-    return db_user
+# Занятое поле при регистрации
+REGISTRATION_USERNAME_TAKEN = "username"
+REGISTRATION_EMAIL_TAKEN = "email"
 
 
-# Получение пользователя по имени пользователя
-def get_user_by_username(db: Session, username: str):
-    return db.query(User).filter(User.username == username).first()
+# Заняты ли имя и email: один запрос с двумя EXISTS по уникальным индексам, до хэширования
+async def registration_conflict(db: AsyncSession, username: str, email: str) -> str | None:
+    result = await db.execute(select(exists().where(User.username == username), exists().where(User.email == email)))
+    username_taken, email_taken = result.one()
+    if username_taken:
+        return REGISTRATION_USERNAME_TAKEN
+    if email_taken:
+        return REGISTRATION_EMAIL_TAKEN
+    return None
+
+
+# Регистрация одной вставкой: конфликт по имени или email даёт None, а не исключение в commit
+async def register_user(
+    db: AsyncSession, username: str, email: str, password: str, role_id: int | None = None,
+) -> int | None:
+    hashed_password = await password_hasher.hash(password)
+    stmt = (
+        dialect_insert(db.get_bind().dialect.name, User)
+        .values(username=username, email=email, password=hashed_password, role_id=role_id)
+        .on_conflict_do_nothing()
+        .returning(User.id)
+    )
+    user_id = (await db.execute(stmt)).scalar_one_or_none()
+    await db.commit()
+    return user_id
+
+
+# Получение пользователя по имени пользователя (роль загружается сразу)
+async def get_user_by_username(db: AsyncSession, username: str):
+    result = await db.execute(select(User).options(joinedload(User.role)).where(User.username == username))
+    return result.scalar_one_or_none()
+
+
+# Получение id, имени и роли пользователя: сначала из кэша, иначе одним запросом
+async def get_cached_user(db: AsyncSession, username: str) -> CachedUser | None:
+    cached = user_cache.get(username)
+    if cached is not None:
+        return cached
+    user = await get_user_by_username(db, username)
+    if not user:
+        return None
+    cached = CachedUser(id=user.id, username=user.username, role=user.role.name if user.role else None)
+    user_cache.set(username, cached)
+    return cached
 
 
 # Получение пользователя по ID
-def get_user_by_id(db: Session, user_id: int):
-    return db.query(User).filter(User.id == user_id).first()
+async def get_user_by_id(db: AsyncSession, user_id: int):
+    result = await db.execute(select(User).options(joinedload(User.role)).where(User.id == user_id))
+    return result.scalar_one_or_none()
 
 
 # Проверка наличия пользователя по email
-def get_user_by_email(db: Session, email: str):
-    return db.query(User).filter(User.email == email).first()
+async def get_user_by_email(db: AsyncSession, email: str):
+    result = await db.execute(select(User).options(joinedload(User.role)).where(User.email == email))
+    return result.scalar_one_or_none()
+
+
+# Экранирование спецсимволов LIKE в пользовательском вводе
+def escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+# Поиск пользователей по имени с keyset-пагинацией (id > after_id),
+# текущий пользователь и его контакты исключаются в SQL через anti-join
+async def search_users(db: AsyncSession, user_id: int, query: str, limit: int, after_id: int | None = None):
+    pattern = escape_like(query)
+    if len(query) >= 3:
+        # Индекс pg_trgm работает для подстрок от трёх символов
+        condition = User.username.ilike(f"%{pattern}%", escape="\\")
+    else:
+        condition = func.lower(User.username).like(f"{pattern.lower()}%", escape="\\")
+    already_added = exists().where(Contact.user_id == user_id, Contact.contact_id == User.id)
+    stmt = (
+        select(User.id, User.username)
+        .where(condition, User.id != user_id, ~already_added)
+        .order_by(User.id)
+        .limit(limit)
+    )
+    if after_id is not None:
+        stmt = stmt.where(User.id > after_id)
+    result = await db.execute(stmt)
+    return result.all()
+
+
+# Версия данных пользователя для ETag: один запрос по первичному ключу, без соединений
+async def get_data_version(db: AsyncSession, user_id: int) -> int:
+    result = await db.execute(select(User.data_version).where(User.id == user_id))
+    return result.scalar_one_or_none() or 0
+
+
+# Увеличивает версии данных в текущей транзакции: закэшированные ответы и ETag устаревают
+async def _bump_data_versions(db: AsyncSession, user_ids: set[int]) -> None:
+    if user_ids:
+        await db.execute(
+            update(User)
+            .where(User.id.in_(user_ids))
+            .values(data_version=User.data_version + 1)
+            .execution_options(synchronize_session=False)
+        )
+
+
+# Пользователи, связанные с данным записью о контакте в любую сторону
+async def _linked_user_ids(db: AsyncSession, user_id: int) -> set[int]:
+    result = await db.execute(
+        select(Contact.contact_id).where(Contact.user_id == user_id)
+        .union(select(Contact.user_id).where(Contact.contact_id == user_id))
+    )
+    return set(result.scalars())
 
 
 # Обновление информации о пользователе
-def update_user(db: Session, user_id: int, username: str, email: str, password: str):
-    db_user = db.query(User).filter(User.id == user_id).first()
+async def update_user(db: AsyncSession, user_id: int, username: str, email: str, password: str):
+    db_user = await db.get(User, user_id)
     if db_user:
+        old_username = db_user.username
         db_user.username = username
         db_user.email = email
-        db_user.password = hash_password(password)  # Обновляем пароль
-        db.commit()
-        db.refresh(db_user)
+        db_user.password = await password_hasher.hash(password)  # Обновляем пароль
+        # Имя видно в списках контактов и запросов у всех связанных пользователей
+        await _bump_data_versions(db, {user_id} | await _linked_user_ids(db, user_id))
+        await db.commit()
+        await db.refresh(db_user)
+        invalidate_user(old_username)
+        invalidate_user(username)
         return db_user
     return None
 
 
+# Замена хэша пароля на хэш по текущей политике; не срабатывает, если пароль уже сменили
+async def update_password_hash(db: AsyncSession, user_id: int, old_hash: str, new_hash: str) -> None:
+    await db.execute(
+        update(User).where(User.id == user_id, User.password == old_hash).values(password=new_hash)
+    )
+    await db.commit()
+
+
 # Удаление пользователя
-def delete_user(db: Session, user_id: int):
-    db_user = db.query(User).filter(User.id == user_id).first()
+async def delete_user(db: AsyncSession, user_id: int):
+    db_user = await db.get(User, user_id)
     if db_user:
-        db.delete(db_user)
-        db.commit()
+        # Контакты удаляются каскадом на стороне БД (ondelete="CASCADE")
+        await _bump_data_versions(db, await _linked_user_ids(db, user_id))
+        await db.execute(delete(User).where(User.id == user_id))
+        await db.commit()
+        invalidate_user(db_user.username)
+        contact_graph.remove_user(user_id)
         return db_user
     return None
+
+
+# Контакты пользователя: только нужные колонки, сортировка по id связи
+def contacts_query(user_id: int):
+    return (
+        select(Contact.id.label("link_id"), User.id, User.username, Contact.confirmed)
+        .join(User, User.id == Contact.contact_id)
+        .where(Contact.user_id == user_id)
+        .order_by(Contact.id)
+    )
+
+
+# Страница контактов (keyset по id связи)
+async def list_contacts(db: AsyncSession, user_id: int, limit: int, after_id: int | None = None):
+    stmt = contacts_query(user_id).limit(limit)
+    if after_id is not None:
+        stmt = stmt.where(Contact.id > after_id)
+    return (await db.execute(stmt)).all()
+
+
+# Количество контактов (всего и подтверждённых) одним агрегатом
+async def count_contacts(db: AsyncSession, user_id: int) -> tuple[int, int]:
+    result = await db.execute(
+        select(func.count(), func.coalesce(func.sum(Contact.confirmed), 0)).where(Contact.user_id == user_id)
+    )
+    total, confirmed = result.one()
+    return total, confirmed
+
+
+# Страница входящих неподтверждённых запросов (keyset по id связи)
+async def list_pending_requests(db: AsyncSession, user_id: int, limit: int, after_id: int | None = None):
+    stmt = (
+        select(Contact.id.label("request_id"), User.id, User.username)
+        .join(User, User.id == Contact.user_id)
+        .where(Contact.contact_id == user_id, Contact.confirmed == 0)
+        .order_by(Contact.id)
+        .limit(limit)
+    )
+    if after_id is not None:
+        stmt = stmt.where(Contact.id > after_id)
+    return (await db.execute(stmt)).all()
+
+
+# Количество входящих неподтверждённых запросов
+async def count_pending_requests(db: AsyncSession, user_id: int) -> int:
+    result = await db.execute(
+        select(func.count()).where(Contact.contact_id == user_id, Contact.confirmed == 0)
+    )
+    return result.scalar_one()
+
+
+# Результаты операций с контактами
+CONTACT_USER_NOT_FOUND = "user_not_found"
+CONTACT_EXISTS = "exists"
+CONTACT_NOT_FOUND = "not_found"
+CONTACT_PENDING = "pending"
+CONTACT_CONFIRMED = "confirmed"
+CONTACT_REMOVED = "removed"
+CONTACT_SELF = "self"
+
+
+# Условие на обе записи пары (user_id -> contact_id и обратную)
+def _pair_filter(table, user_id: int, contact_id: int):
+    return or_(
+        and_(table.user_id == user_id, table.contact_id == contact_id),
+        and_(table.user_id == contact_id, table.contact_id == user_id),
+    )
+
+
+# Блокирует строки обоих пользователей в порядке id и возвращает id контакта.
+# Встречные запросы одной пары выполняются по очереди, поэтому взаимное
+# добавление всегда подтверждается.
+async def _lock_pair(db: AsyncSession, user_id: int, contact_username: str) -> int | None:
+    result = await db.execute(
+        select(User.id, User.username)
+        .where(or_(User.id == user_id, User.username == contact_username))
+        .order_by(User.id)
+        .with_for_update()
+    )
+    for row in result:
+        if row.username == contact_username and row.id != user_id:
+            return row.id
+    return None
+
+
+# Добавление контакта одной транзакцией: вставка с ON CONFLICT и подтверждение пары
+async def add_contact(db: AsyncSession, user_id: int, contact_username: str) -> str:
+    contact_id = await _lock_pair(db, user_id, contact_username)
+    if contact_id is None:
+        await db.rollback()
+        return CONTACT_USER_NOT_FOUND
+
+    insert_stmt = (
+        dialect_insert(db.get_bind().dialect.name, Contact)
+        .values(user_id=user_id, contact_id=contact_id, confirmed=0)
+        .on_conflict_do_nothing(index_elements=["user_id", "contact_id"])
+        .returning(Contact.id)
+    )
+    if (await db.execute(insert_stmt)).scalar_one_or_none() is None:
+        await db.rollback()
+        return CONTACT_EXISTS
+    # Меняются и список контактов пользователя, и входящие запросы контакта
+    await _bump_data_versions(db, {user_id, contact_id})
+
+    # Если встречная запись есть, подтверждаем обе одним UPDATE
+    pair_row = aliased(Contact)
+    pair_size = select(func.count()).select_from(pair_row).where(_pair_filter(pair_row, user_id, contact_id))
+    confirmed = await db.execute(
+        update(Contact)
+        .where(_pair_filter(Contact, user_id, contact_id), pair_size.scalar_subquery() == 2)
+        .values(confirmed=1)
+        .returning(Contact.id)
+    )
+    status = CONTACT_CONFIRMED if confirmed.all() else CONTACT_PENDING
+    await db.commit()
+    if status == CONTACT_CONFIRMED:
+        contact_graph.link(user_id, contact_id)
+    return status
+
+
+# Удаление контакта вместе со встречной записью одним DELETE
+async def remove_contact(db: AsyncSession, user_id: int, contact_username: str) -> str:
+    contact_id = await _lock_pair(db, user_id, contact_username)
+    if contact_id is None:
+        await db.rollback()
+        return CONTACT_USER_NOT_FOUND
+
+    own_row = aliased(Contact)
+    own_exists = exists().where(own_row.user_id == user_id, own_row.contact_id == contact_id)
+    deleted = await db.execute(
+        delete(Contact)
+        .where(_pair_filter(Contact, user_id, contact_id), own_exists)
+        .returning(Contact.id)
+    )
+    if not deleted.all():
+        await db.rollback()
+        return CONTACT_NOT_FOUND
+    await _bump_data_versions(db, {user_id, contact_id})
+    await db.commit()
+    contact_graph.unlink(user_id, contact_id)
+    return CONTACT_REMOVED
+
+
+# Блокирует строки текущего пользователя и всех найденных контактов в порядке id;
+# возвращает {username: id} для найденных
+async def _lock_users(db: AsyncSession, user_id: int, usernames: list[str]) -> dict[str, int]:
+    result = await db.execute(
+        select(User.id, User.username)
+        .where(or_(User.id == user_id, User.username.in_(usernames)))
+        .order_by(User.id)
+        .with_for_update()
+    )
+    return {row.username: row.id for row in result}
+
+
+# Статусы для имён, которые не превратились в id контакта
+def _resolve_batch(user_id: int, usernames: list[str], found: dict[str, int]) -> tuple[dict[str, str], dict[str, int]]:
+    statuses, targets = {}, {}
+    for username in usernames:
+        contact_id = found.get(username)
+        if contact_id is None:
+            statuses[username] = CONTACT_USER_NOT_FOUND
+        elif contact_id == user_id:
+            statuses[username] = CONTACT_SELF
+        else:
+            targets[username] = contact_id
+    return statuses, targets
+
+
+# Пакетное добавление: один SELECT ... IN, одна вставка и одно подтверждение встречных пар
+async def add_contacts(db: AsyncSession, user_id: int, usernames: list[str]) -> dict[str, str]:
+    statuses, targets = _resolve_batch(user_id, usernames, await _lock_users(db, user_id, usernames))
+    if not targets:
+        await db.rollback()
+        return statuses
+
+    insert_stmt = (
+        dialect_insert(db.get_bind().dialect.name, Contact)
+        .values([{"user_id": user_id, "contact_id": contact_id, "confirmed": 0} for contact_id in targets.values()])
+        .on_conflict_do_nothing(index_elements=["user_id", "contact_id"])
+        .returning(Contact.contact_id)
+    )
+    inserted = set((await db.execute(insert_stmt)).scalars())
+
+    # Подтверждаем обе записи тех пар, где встречная запись уже была
+    confirmed = set()
+    if inserted:
+        reverse_row = aliased(Contact)
+        reverse_exists = exists().where(
+            reverse_row.user_id == Contact.contact_id, reverse_row.contact_id == Contact.user_id
+        )
+        rows = await db.execute(
+            update(Contact)
+            .where(
+                or_(
+                    and_(Contact.user_id == user_id, Contact.contact_id.in_(inserted)),
+                    and_(Contact.user_id.in_(inserted), Contact.contact_id == user_id),
+                ),
+                reverse_exists,
+            )
+            .values(confirmed=1)
+            .returning(Contact.user_id, Contact.contact_id)
+        )
+        confirmed = {row.contact_id for row in rows if row.user_id == user_id}
+        await _bump_data_versions(db, {user_id} | inserted)
+    await db.commit()
+    for contact_id in confirmed:
+        contact_graph.link(user_id, contact_id)
+
+    for username, contact_id in targets.items():
+        if contact_id not in inserted:
+            statuses[username] = CONTACT_EXISTS
+        elif contact_id in confirmed:
+            statuses[username] = CONTACT_CONFIRMED
+        else:
+            statuses[username] = CONTACT_PENDING
+    return statuses
+
+
+# Пакетное удаление: пары удаляются одним DELETE, если у пользователя есть своя запись
+async def remove_contacts(db: AsyncSession, user_id: int, usernames: list[str]) -> dict[str, str]:
+    statuses, targets = _resolve_batch(user_id, usernames, await _lock_users(db, user_id, usernames))
+    if not targets:
+        await db.rollback()
+        return statuses
+
+    own_row = aliased(Contact)
+    own_contacts = select(own_row.contact_id).where(
+        own_row.user_id == user_id, own_row.contact_id.in_(list(targets.values()))
+    )
+    rows = await db.execute(
+        delete(Contact)
+        .where(
+            or_(
+                and_(Contact.user_id == user_id, Contact.contact_id.in_(own_contacts)),
+                and_(Contact.contact_id == user_id, Contact.user_id.in_(own_contacts)),
+            )
+        )
+        .returning(Contact.user_id, Contact.contact_id)
+    )
+    removed = {row.contact_id for row in rows if row.user_id == user_id}
+    if removed:
+        await _bump_data_versions(db, {user_id} | removed)
+    await db.commit()
+    for contact_id in removed:
+        contact_graph.unlink(user_id, contact_id)
+
+    for username, contact_id in targets.items():
+        statuses[username] = CONTACT_REMOVED if contact_id in removed else CONTACT_NOT_FOUND
+    return statuses
+
+
+# Id подтверждённых контактов: из кэша смежности или одним запросом по индексу
+# (user_id, confirmed, contact_id)
+async def get_contact_ids(db: AsyncSession, user_id: int) -> set[int]:
+    contact_ids = contact_graph.get(user_id)
+    if contact_ids is None:
+        result = await db.execute(
+            select(Contact.contact_id).where(Contact.user_id == user_id, Contact.confirmed == 1)
+        )
+        contact_ids = set(result.scalars())
+        contact_graph.set(user_id, contact_ids)
+    return contact_ids
+
+
+# Общие подтверждённые контакты двух пользователей: страница по id и общее количество.
+# С кэшем это пересечение множеств, без него — соединение по индексу контактов
+async def mutual_contacts(
+    db: AsyncSession, user_id: int, other_id: int, limit: int, after_id: int | None = None,
+) -> tuple[list, int]:
+    if contact_graph.enabled:
+        mutual = sorted(await get_contact_ids(db, user_id) & await get_contact_ids(db, other_id))
+        page_ids = mutual[bisect_right(mutual, after_id):][:limit] if after_id is not None else mutual[:limit]
+        if not page_ids:
+            return [], len(mutual)
+        rows = await db.execute(select(User.id, User.username).where(User.id.in_(page_ids)).order_by(User.id))
+        return rows.all(), len(mutual)
+
+    own_row, other_row = aliased(Contact), aliased(Contact)
+    mutual_ids = (
+        select(own_row.contact_id)
+        .join(other_row, and_(
+            other_row.user_id == other_id, other_row.contact_id == own_row.contact_id, other_row.confirmed == 1,
+        ))
+        .where(own_row.user_id == user_id, own_row.confirmed == 1)
+    )
+    total = (await db.execute(select(func.count()).select_from(mutual_ids.subquery()))).scalar_one()
+    stmt = select(User.id, User.username).where(User.id.in_(mutual_ids)).order_by(User.id).limit(limit)
+    if after_id is not None:
+        stmt = stmt.where(User.id > after_id)
+    return (await db.execute(stmt)).all(), total
+
+
+# «Возможно, вы знакомы»: контакты контактов, ранжированные по числу общих, одним агрегатом.
+# Учитываются только последние max_fanout контактов пользователя, чтобы время ответа
+# не росло вместе с длиной его списка
+async def suggest_contacts(db: AsyncSession, user_id: int, limit: int, max_fanout: int):
+    friends = (
+        select(Contact.contact_id)
+        .where(Contact.user_id == user_id, Contact.confirmed == 1)
+        .order_by(Contact.id.desc())
+        .limit(max_fanout)
+        .subquery()
+    )
+    candidate, known = aliased(Contact), aliased(Contact)
+    mutual_count = func.count().label("mutual_count")
+    stmt = (
+        select(User.id, User.username, mutual_count)
+        .select_from(candidate)
+        .join(friends, candidate.user_id == friends.c.contact_id)
+        .join(User, User.id == candidate.contact_id)
+        .where(
+            candidate.confirmed == 1,
+            candidate.contact_id != user_id,
+            # Уже связанные с пользователем в любую сторону (в том числе ожидающие) не предлагаются
+            ~exists().where(_pair_filter(known, user_id, candidate.contact_id)),
+        )
+        .group_by(User.id, User.username)
+        .order_by(mutual_count.desc(), User.id)
+        .limit(limit)
+    )
+    return (await db.execute(stmt)).all()
+
+
+# Последние события журнала пользователя, новые первыми (keyset по id)
+async def list_activity(db: AsyncSession, user_id: int, limit: int, before_id: int | None = None):
+    stmt = (
+        select(AuditEvent.id, AuditEvent.event, AuditEvent.ip, AuditEvent.data, AuditEvent.created_at)
+        .where(AuditEvent.user_id == user_id)
+        .order_by(AuditEvent.id.desc())
+        .limit(limit)
+    )
+    if before_id is not None:
+        stmt = stmt.where(AuditEvent.id < before_id)
+    return (await db.execute(stmt)).all()
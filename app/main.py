@@ -0,0 +1,79 @@
+from contextlib import asynccontextmanager
+from fastapi import FastAPI
+from fastapi.middleware.cors import CORSMiddleware
+from starlette.middleware.sessions import SessionMiddleware
+from app.api.google_auth import OAUTH_PATH_PREFIX, create_google_metadata_cache
+from app.api.permissions import permission_registry
+from app.api.routes import router
+from app.audit import audit_log
+from app.core.config import settings
+from app.core.db import AsyncSessionLocal, dispose_async_engine, init_async_engine
+from app.core.hashing import password_hasher
+from app.core.idempotency import idempotency_store
+from app.core.metrics import MetricsMiddleware, metrics_endpoint
+from app.core.middleware import PathScopedMiddleware
+from app.core.rate_limit import rate_limiter
+from app.core.token_store import revocation_checker, token_store
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Движок БД создаётся здесь, а не при импорте
+    init_async_engine()
+    # Загружаем карту прав ролей (и создаём роль "default") до первого запроса
+    async with AsyncSessionLocal() as db:
+        await permission_registry.seed(db)
+    # Список отозванных токенов загружается в фильтр и дальше синхронизируется в фоне
+    await revocation_checker.start()
+    # Фоновая запись журнала событий пакетами
+    if settings.AUDIT_ENABLED:
+        await audit_log.start()
+    # Метаданные и ключи Google, чтобы первый вход не ждал их загрузки
+    google_metadata = create_google_metadata_cache()
+    await google_metadata.start()
+    yield
+    await google_metadata.stop()
+    # Остаток очереди журнала дописывается, пока соединения с БД открыты
+    await audit_log.stop()
+    await revocation_checker.stop()
+    await token_store.close()
+    await rate_limiter.close()
+    await idempotency_store.close()
+    # Останавливаем пул хэширования паролей и закрываем соединения с БД
+    await password_hasher.shutdown()
+    await dispose_async_engine()
+
+
+def create_app() -> FastAPI:
+    """Создаёт приложение: uvicorn app.main:app или uvicorn --factory app.main:create_app."""
+    app = FastAPI(lifespan=lifespan)
+
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["http://localhost:3000", "http://127.0.0.1:3000"],  # Разрешить React-приложение
+        allow_credentials=True,                  # Если вы используете cookies
+        allow_methods=["*"],                     # Разрешить все HTTP-методы
+        allow_headers=["*"],                     # Разрешить все заголовки
+        expose_headers=["X-Next-Cursor", "ETag"],  # Курсор пагинации и версия ответа доступны из JS
+    )
+    # Сессия нужна только authlib для state/nonce входа через Google: остальные запросы
+    # не подписывают и не проверяют куку, а браузер отправляет её только на /auth/google
+    app.add_middleware(
+        PathScopedMiddleware,
+        middleware=SessionMiddleware,
+        prefixes=(OAUTH_PATH_PREFIX,),
+        secret_key=settings.SECRET_KEY,
+        path=OAUTH_PATH_PREFIX,
+        max_age=settings.OAUTH_SESSION_MAX_AGE_SECONDS,
+    )
+    app.include_router(router)
+
+    if settings.METRICS_ENABLED:
+        # Добавляется последним, чтобы учитывать время всех остальных middleware
+        app.add_middleware(MetricsMiddleware)
+        app.add_route("/metrics", metrics_endpoint, include_in_schema=False)
+
+    return app
+
+
+app = create_app()
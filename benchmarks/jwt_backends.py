@@ -0,0 +1,54 @@
+"""Микробенчмарк JWT: python-jose против PyJWT и проверка через кэш.
+
+Запуск из корня проекта:
+    python -m benchmarks.jwt_backends --iterations 20000
+"""
+import argparse
+import os
+import timeit
+
+# Для бенчмарка достаточно фиктивных настроек, если .env отсутствует
+for _name, _value in {
+    "POSTGRES_SERVER": "localhost",
+    "POSTGRES_USER": "bench",
+    "SECRET_KEY": "benchmark-secret",
+    "ALGORITHM": "HS256",
+    "ACCESS_TOKEN_EXPIRE_MINUTES": "15",
+    "GOOGLE_CLIENT_ID": "bench",
+    "GOOGLE_CLIENT_SECRET": "bench",
+}.items():
+    os.environ.setdefault(_name, _value)
+
+from app.core import security  # noqa: E402
+
+
+def run(iterations: int) -> None:
+    claims = {"sub": "benchmark-user", "role": "default"}
+    rows = []
+    for name in ("jose", "pyjwt"):
+        security.jwt_backend = security.load_jwt_backend(name)
+        token = security.create_access_token(claims)
+        encode = timeit.timeit(lambda: security.create_access_token(claims), number=iterations)
+
+        # Холодный путь: кэш очищается перед каждой проверкой
+        def cold():
+            security.claims_cache.clear()
+            security.decode_access_token(token)
+
+        decode = timeit.timeit(cold, number=iterations)
+        security.decode_access_token(token)
+        cached = timeit.timeit(lambda: security.decode_access_token(token), number=iterations)
+        rows.append((name, encode, decode, cached))
+
+    print(f"{'backend':<8} {'encode µs':>10} {'decode µs':>10} {'cached µs':>10}")
+    for name, encode, decode, cached in rows:
+        print(
+            f"{name:<8} {encode / iterations * 1e6:>10.1f} "
+            f"{decode / iterations * 1e6:>10.1f} {cached / iterations * 1e6:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=20000)
+    run(parser.parse_args().iterations)
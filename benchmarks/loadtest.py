@@ -0,0 +1,332 @@
+"""Нагрузочный тест основных эндпоинтов авторизации.
+
+По умолчанию приложение поднимается в этом же процессе поверх SQLite
+(sqlite+aiosqlite), а вместо Google работает локальная заглушка OpenID
+(benchmarks/oidc_stub.py), поэтому тест воспроизводим на одной машине без сети. С --base-url нагрузка идёт на уже
+запущенный сервер (например, с локальным PostgreSQL).
+
+    python -m benchmarks.loadtest --concurrency 16 --iterations 20
+    python -m benchmarks.loadtest --script benchmarks/scenarios/default.jsonl --compare benchmarks/baseline.json
+    python -m benchmarks.loadtest --save-baseline benchmarks/baseline.json
+
+Сценарий — JSONL, по одному шагу на строку (как requests.jsonl):
+    {"name": "login", "method": "POST", "path": "/login", "form": {"username": "{user}", "password": "{password}"}}
+В строках подставляются {user}, {password}, {peer} (другой пользователь), {n} (уникальный номер)
+и {run} (метка запуска, чтобы регистрации не конфликтовали между запусками).
+Каждый виртуальный пользователь проигрывает сценарий по порядку --iterations раз.
+Шаг с "follow_redirects": true проходит редиректы целиком (вход через Google, scenarios/google.jsonl).
+
+Для --base-url пользователи создаются заранее:
+    python -m benchmarks.loadtest --write-users bench-users.csv --concurrency 16
+    python -m app.cli import-users bench-users.csv
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+
+import httpx
+
+DEFAULT_SCRIPT = Path(__file__).parent / "scenarios" / "default.jsonl"
+PASSWORD = "benchmark-password"
+RUN_ID = int(time.time())
+_counter = itertools.count(1)
+
+
+def configure_environment(db_url: str) -> None:
+    """Настройки для запуска приложения в процессе бенчмарка."""
+    defaults = {
+        "POSTGRES_SERVER": "localhost",
+        "POSTGRES_USER": "bench",
+        "SECRET_KEY": "benchmark-secret",
+        "ALGORITHM": "HS256",
+        "ACCESS_TOKEN_EXPIRE_MINUTES": "15",
+        "GOOGLE_CLIENT_ID": "bench",
+        "GOOGLE_CLIENT_SECRET": "bench",
+        # Все виртуальные пользователи приходят с одного адреса
+        "RATE_LIMIT_ENABLED": "false",
+    }
+    for name, value in defaults.items():
+        os.environ.setdefault(name, value)
+    os.environ["DATABASE_URL"] = db_url
+
+
+def load_script(path: Path) -> list[dict]:
+    with open(path, encoding="utf-8") as stream:
+        return [json.loads(line) for line in stream if line.strip()]
+
+
+def _render(value, variables: dict):
+    if isinstance(value, str):
+        return value.format(**variables)
+    if isinstance(value, dict):
+        return {key: _render(item, variables) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_render(item, variables) for item in value]
+    return value
+
+
+def percentile(samples: list[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def create_schema() -> None:
+    from app.api.models import Base
+    from app.core.db import init_async_engine
+
+    async with init_async_engine().begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+
+async def seed_users(count: int) -> list[str]:
+    """Создаёт пользователей напрямую в БД с одним заранее посчитанным хэшем."""
+    from sqlalchemy import insert
+    from app.api.models import User
+    from app.api.permissions import permission_registry
+    from app.core.db import AsyncSessionLocal, init_async_engine
+    from app.core.security import hash_password
+
+    async with AsyncSessionLocal() as db:
+        role_id = await permission_registry.get_default_role_id(db)
+    hashed = hash_password(PASSWORD)
+    usernames = [f"bench-{RUN_ID}-{i}" for i in range(count)]
+    async with init_async_engine().begin() as conn:
+        await conn.execute(
+            insert(User),
+            [{"username": name, "email": f"{name}@example.com", "password": hashed, "role_id": role_id}
+             for name in usernames],
+        )
+    return usernames
+
+
+async def virtual_user(client: httpx.AsyncClient, script: list[dict], iterations: int,
+                       user: str, peers: list[str], stats: dict) -> None:
+    peer_cycle = itertools.cycle(peers)
+    for _ in range(iterations):
+        for step in script:
+            variables = {
+                "user": user, "password": PASSWORD, "peer": next(peer_cycle), "n": next(_counter), "run": RUN_ID,
+            }
+            kwargs = {}
+            for key in ("params", "json", "data"):
+                if key in step:
+                    kwargs[key] = _render(step[key], variables)
+            if "form" in step:
+                kwargs["data"] = _render(step["form"], variables)
+            if step.get("follow_redirects"):
+                kwargs["follow_redirects"] = True
+            started = time.perf_counter()
+            try:
+                response = await client.request(step["method"], _render(step["path"], variables), **kwargs)
+                ok = response.status_code < 500 and response.status_code not in (401, 403, 422)
+            except httpx.HTTPError:
+                ok = False
+            finished = time.perf_counter()
+            stats[step["name"]]["latency"].append(finished - started)
+            stats[step["name"]]["spans"].append((started, finished))
+            if not ok:
+                stats[step["name"]]["errors"] += 1
+
+
+def busy_time(spans: list[tuple[float, float]]) -> float:
+    """Время, когда шёл хотя бы один запрос шага: длина объединения интервалов."""
+    total, busy_until = 0.0, float("-inf")
+    for started, finished in sorted(spans):
+        if finished > busy_until:
+            total += finished - max(started, busy_until)
+            busy_until = finished
+    return total
+
+
+def summarize(stats: dict, wall_time: float) -> dict:
+    report = {}
+    for name, data in stats.items():
+        samples = data["latency"]
+        # Пропускная способность шага по его собственному времени занятости, а не по всему
+        # прогону: иначе у всех шагов одно и то же число и замедление одного не видно
+        report[name] = {
+            "count": len(samples),
+            "errors": data["errors"],
+            "p50_ms": round(percentile(samples, 0.50) * 1000, 2),
+            "p95_ms": round(percentile(samples, 0.95) * 1000, 2),
+            "p99_ms": round(percentile(samples, 0.99) * 1000, 2),
+            "mean_ms": round(statistics.fmean(samples) * 1000, 2),
+            "rps": round(len(samples) / busy_time(data["spans"]), 1),
+        }
+    total = sum(item["count"] for item in report.values())
+    report["_total"] = {"count": total, "rps": round(total / wall_time, 1), "wall_time_s": round(wall_time, 2)}
+    return report
+
+
+def print_report(report: dict) -> None:
+    print(f"{'step':<16} {'count':>7} {'err':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>8}")
+    for name, item in report.items():
+        if name.startswith("_"):
+            continue
+        print(f"{name:<16} {item['count']:>7} {item['errors']:>5} {item['p50_ms']:>9} "
+              f"{item['p95_ms']:>9} {item['p99_ms']:>9} {item['rps']:>8}")
+    total = report["_total"]
+    print(f"total: {total['count']} requests in {total['wall_time_s']} s, {total['rps']} req/s")
+    if "_oidc_calls" in report:
+        print(f"OpenID provider calls: startup {report['_oidc_calls']['startup']}, run {report['_oidc_calls']['run']}")
+
+
+def environment(args: argparse.Namespace) -> dict:
+    return {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "target": args.base_url or "in-process sqlite",
+        "concurrency": args.concurrency,
+        "iterations": args.iterations,
+    }
+
+
+def environment_mismatch(current: dict, baseline: dict) -> list[str]:
+    """Параметры окружения, которыми прогон отличается от эталона."""
+    recorded = baseline.get("environment", {})
+    return [
+        f"{key}: baseline {recorded.get(key)!r}, current {value!r}"
+        for key, value in current.items() if recorded.get(key) != value
+    ]
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Шаги, у которых p50 или p95 вырос либо пропускная способность упала больше чем на tolerance."""
+    regressions = []
+    base_total, total = baseline.get("total"), report["_total"]
+    if base_total and total["rps"] < base_total["rps"] * (1 - tolerance):
+        regressions.append(f"total: throughput {base_total['rps']} -> {total['rps']} req/s")
+    for name, base in baseline.get("steps", {}).items():
+        current = report.get(name)
+        if not current:
+            continue
+        for key in ("p50_ms", "p95_ms"):
+            if current[key] > base[key] * (1 + tolerance):
+                regressions.append(f"{name}: {key[:3]} {base[key]} -> {current[key]} ms")
+        if current["rps"] < base["rps"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {base['rps']} -> {current['rps']} req/s")
+    return regressions
+
+
+async def run(args: argparse.Namespace) -> dict:
+    script = load_script(Path(args.script))
+    stats = defaultdict(lambda: {"latency": [], "spans": [], "errors": 0})
+
+    if args.base_url:
+        users = [args.user_prefix + str(i) for i in range(args.concurrency)]
+        transport, lifespan, stub, mounts = None, None, None, None
+    else:
+        from app.api.google_auth import get_google_client
+        from app.main import app
+        from benchmarks.oidc_stub import STUB_ORIGIN, OIDCStub
+
+        stub = OIDCStub()
+        stub.install(get_google_client())
+        await create_schema()
+        lifespan = app.router.lifespan_context(app)
+        await lifespan.__aenter__()
+        users = await seed_users(args.concurrency)
+        transport = httpx.ASGITransport(app=app)
+        # Редиректы на заглушку провайдера и на фронтенд после входа не уходят в сеть
+        mounts = {
+            STUB_ORIGIN: httpx.ASGITransport(app=stub.app),
+            "http://127.0.0.1:3000": httpx.MockTransport(lambda request: httpx.Response(200)),
+        }
+        startup_calls = dict(stub.calls)
+
+    try:
+        clients = [
+            httpx.AsyncClient(transport=transport, mounts=mounts, base_url=args.base_url or "http://bench", timeout=60)
+            for _ in users
+        ]
+        started = time.perf_counter()
+        await asyncio.gather(*[
+            virtual_user(client, script, args.iterations, user, [u for u in users if u != user] or [user], stats)
+            for client, user in zip(clients, users)
+        ])
+        wall_time = time.perf_counter() - started
+        for client in clients:
+            await client.aclose()
+    finally:
+        if lifespan is not None:
+            await lifespan.__aexit__(None, None, None)
+    report = summarize(stats, wall_time)
+    if stub is not None:
+        # Исходящие запросы к провайдеру: при старте и за время прогона
+        report["_oidc_calls"] = {"startup": startup_calls, "run": dict(stub.calls - Counter(startup_calls))}
+    return report
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", help="URL запущенного сервиса; по умолчанию приложение поднимается в процессе")
+    parser.add_argument("--db-url", help="БД для запуска в процессе (по умолчанию временный файл SQLite)")
+    parser.add_argument("--script", default=str(DEFAULT_SCRIPT))
+    parser.add_argument("--concurrency", type=int, default=8, help="Число виртуальных пользователей")
+    parser.add_argument("--iterations", type=int, default=10, help="Повторов сценария на пользователя")
+    parser.add_argument("--user-prefix", default="bench-",
+                        help="Префикс заранее созданных пользователей для --base-url (bench-0, bench-1, ...)")
+    parser.add_argument("--write-users", help="Записать CSV с пользователями для --base-url и выйти")
+    parser.add_argument("--json", help="Сохранить отчёт в файл")
+    parser.add_argument("--save-baseline", help="Сохранить отчёт как эталон")
+    parser.add_argument("--compare", help="Сравнить с эталоном и завершиться с кодом 1 при регрессии")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Допустимое ухудшение (0.25 = 25%%)")
+    parser.add_argument("--ignore-environment", action="store_true",
+                        help="Сравнивать с эталоном, снятым в другом окружении или с другими параметрами")
+    args = parser.parse_args()
+
+    if args.write_users:
+        with open(args.write_users, "w", encoding="utf-8") as stream:
+            stream.write("username,email,password\n")
+            for i in range(args.concurrency):
+                stream.write(f"{args.user_prefix}{i},{args.user_prefix}{i}@example.com,{PASSWORD}\n")
+        return 0
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())
+        mismatch = environment_mismatch(environment(args), baseline)
+        for line in mismatch:
+            print("ENVIRONMENT", line, file=sys.stderr)
+        # Цифры с другой машины или с другой нагрузкой несравнимы
+        if mismatch and not args.ignore_environment:
+            print("Baseline was recorded in a different environment; re-record it or pass --ignore-environment",
+                  file=sys.stderr)
+            return 2
+
+    if not args.base_url:
+        db_url = args.db_url or f"sqlite+aiosqlite:///{tempfile.mkdtemp(prefix='auth-bench-')}/bench.db"
+        configure_environment(db_url)
+
+    report = asyncio.run(run(args))
+    print_report(report)
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2) + "\n")
+    if args.save_baseline:
+        recorded = {
+            "environment": environment(args),
+            "total": report["_total"],
+            "steps": {name: item for name, item in report.items() if not name.startswith("_")},
+        }
+        Path(args.save_baseline).write_text(json.dumps(recorded, indent=2) + "\n")
+    if args.compare:
+        regressions = compare(report, baseline, args.tolerance)
+        for line in regressions:
+            print("REGRESSION", line, file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,86 @@
+"""Локальная заглушка OpenID-провайдера вместо Google.
+
+Отдаёт discovery-документ, JWKS, authorize (сразу возвращает на redirect_uri с кодом)
+и token (ID-токен, подписанный RS256 с nonce из запроса). Считает обращения
+к каждому адресу, чтобы видеть, сколько исходящих запросов делает callback.
+
+В процессе бенчмарка заглушка подключается как транспорт httpx (install), отдельно —
+как обычный сервер:
+    uvicorn benchmarks.oidc_stub:app --port 9000
+    GOOGLE_DISCOVERY_URL=http://127.0.0.1:9000/.well-known/openid-configuration uvicorn main:app
+"""
+import base64
+import json
+import time
+from collections import Counter
+from urllib.parse import urlencode
+
+import httpx
+from authlib.jose import JsonWebKey, jwt
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, RedirectResponse
+from starlette.routing import Route
+
+STUB_ORIGIN = "http://oidc-stub"
+
+
+class OIDCStub:
+    def __init__(self, origin: str = STUB_ORIGIN, client_id: str = "bench"):
+        self.origin = origin
+        self.client_id = client_id
+        self.key = JsonWebKey.generate_key("RSA", 2048, is_private=True, options={"kid": "stub-1"})
+        self.calls = Counter()
+        self.app = Starlette(routes=[
+            Route("/.well-known/openid-configuration", self.discovery),
+            Route("/jwks", self.jwks),
+            Route("/authorize", self.authorize),
+            Route("/token", self.token, methods=["POST"]),
+        ])
+
+    def install(self, oauth_client) -> None:
+        """Направляет все запросы клиента authlib в заглушку без сети."""
+        self.client_id = oauth_client.client_id
+        oauth_client.client_kwargs["transport"] = httpx.ASGITransport(app=self.app)
+        oauth_client._server_metadata_url = f"{self.origin}/.well-known/openid-configuration"
+
+    async def discovery(self, request: Request):
+        self.calls["discovery"] += 1
+        return JSONResponse({
+            "issuer": self.origin,
+            "authorization_endpoint": f"{self.origin}/authorize",
+            "token_endpoint": f"{self.origin}/token",
+            "jwks_uri": f"{self.origin}/jwks",
+            "id_token_signing_alg_values_supported": ["RS256"],
+        })
+
+    async def jwks(self, request: Request):
+        self.calls["jwks"] += 1
+        return JSONResponse({"keys": [self.key.as_dict(is_private=False)]})
+
+    async def authorize(self, request: Request):
+        # Код несёт email и nonce, чтобы token не хранил состояние
+        params = request.query_params
+        email = params.get("login_hint") or f"google-{time.monotonic_ns()}@example.com"
+        code = base64.urlsafe_b64encode(json.dumps({"email": email, "nonce": params.get("nonce")}).encode())
+        query = urlencode({"code": code.decode(), "state": params["state"]})
+        return RedirectResponse(f"{params['redirect_uri']}?{query}", status_code=302)
+
+    async def token(self, request: Request):
+        self.calls["token"] += 1
+        form = await request.form()
+        data = json.loads(base64.urlsafe_b64decode(form["code"]))
+        now = int(time.time())
+        claims = {
+            "iss": self.origin, "aud": self.client_id, "sub": data["email"], "email": data["email"],
+            "name": data["email"].split("@")[0], "nonce": data["nonce"], "iat": now, "exp": now + 300,
+        }
+        id_token = jwt.encode({"alg": "RS256", "kid": "stub-1"}, claims, self.key)
+        return JSONResponse({
+            "access_token": "stub-access-token", "token_type": "Bearer", "expires_in": 300,
+            "id_token": id_token.decode(), "scope": "openid email profile",
+        })
+
+
+stub = OIDCStub(origin="http://127.0.0.1:9000")
+app = stub.app
@@ -0,0 +1,113 @@
+"""Накладные расходы сессии и размера куки на обычных запросах к API.
+
+Сравнивает задержку GET /user-info в процессе (без сети) для трёх вариантов:
+SessionMiddleware на всех маршрутах с прежним набором claims и куки брошенного
+входа через Google, то же без сессионной куки и текущая сборка
+(сессия только на /auth/google, короткие fam и jti в access-токене). Запросы вариантов
+чередуются пачками, чтобы фоновый шум поровну попадал во все варианты.
+
+    python -m benchmarks.request_overhead --requests 3000
+"""
+import argparse
+import asyncio
+import secrets
+import statistics
+import sys
+import tempfile
+import time
+
+import httpx
+
+
+async def measure(client: httpx.AsyncClient, cookie: str, count: int, samples: list[float]) -> None:
+    headers = {"Cookie": cookie}
+    for _ in range(count):
+        started = time.perf_counter()
+        response = await client.get("/user-info", headers=headers)
+        samples.append(time.perf_counter() - started)
+        if response.status_code != 200:
+            raise RuntimeError(f"/user-info returned {response.status_code}: {response.text}")
+
+
+async def run(args: argparse.Namespace) -> list[tuple[str, int, list[float]]]:
+    from starlette.middleware.sessions import SessionMiddleware
+    from app.api.google_auth import get_google_client
+    from app.core.config import settings
+    from app.core.security import create_access_token
+    from app.main import create_app
+    from benchmarks.loadtest import create_schema, seed_users
+    from benchmarks.oidc_stub import OIDCStub
+
+    current = create_app()
+    # Прежняя сборка: сессия разбирается и подписывается на каждом запросе
+    legacy = create_app()
+    legacy.add_middleware(SessionMiddleware, secret_key=settings.SECRET_KEY)
+
+    OIDCStub().install(get_google_client())
+    await create_schema()
+    lifespan = current.router.lifespan_context(current)
+    await lifespan.__aenter__()
+    try:
+        (username,) = await seed_users(1)
+        slim_token = create_access_token(data={
+            "sub": username, "role": "default", "fam": secrets.token_urlsafe(8),
+        })
+        legacy_token = create_access_token(data={
+            "sub": username, "role": "default", "fam": secrets.token_urlsafe(12), "jti": secrets.token_urlsafe(16),
+        })
+
+        transports = {name: httpx.ASGITransport(app=app) for name, app in (("current", current), ("legacy", legacy))}
+        async with httpx.AsyncClient(transport=transports["current"], base_url="http://bench") as client:
+            # Начатый и не завершённый вход через Google оставляет state и nonce в сессии
+            response = await client.get("/auth/google")
+            session = response.cookies["session"]
+
+        variants = [
+            ("global session, legacy claims, pending OAuth", "legacy",
+             f"access_token={legacy_token}; session={session}"),
+            ("global session, legacy claims", "legacy", f"access_token={legacy_token}"),
+            ("scoped session, slim claims", "current", f"access_token={slim_token}"),
+        ]
+        samples = {name: [] for name, _, _ in variants}
+        clients = {
+            name: httpx.AsyncClient(transport=transport, base_url="http://bench")
+            for name, transport in transports.items()
+        }
+        try:
+            for name, app_name, cookie in variants:
+                await measure(clients[app_name], cookie, args.warmup, [])
+            batches = max(1, args.requests // args.batch)
+            for _ in range(batches):
+                for name, app_name, cookie in variants:
+                    await measure(clients[app_name], cookie, args.batch, samples[name])
+        finally:
+            for client in clients.values():
+                await client.aclose()
+        return [(name, len(cookie), samples[name]) for name, _, cookie in variants]
+    finally:
+        await lifespan.__aexit__(None, None, None)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=3000, help="Запросов на вариант")
+    parser.add_argument("--batch", type=int, default=100)
+    parser.add_argument("--warmup", type=int, default=200)
+    args = parser.parse_args()
+
+    from benchmarks.loadtest import configure_environment
+
+    configure_environment(f"sqlite+aiosqlite:///{tempfile.mkdtemp(prefix='auth-overhead-')}/bench.db")
+    results = asyncio.run(run(args))
+
+    baseline = statistics.median(results[0][2])
+    print(f"{'variant':<46} {'cookie B':>9} {'p50 us':>8} {'mean us':>8} {'vs first':>9}")
+    for name, cookie_size, samples in results:
+        p50 = statistics.median(samples)
+        print(f"{name:<46} {cookie_size:>9} {p50 * 1e6:>8.0f} {statistics.fmean(samples) * 1e6:>8.0f} "
+              f"{(p50 - baseline) / baseline:>+8.1%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+"""Масштабирование пропускной способности по числу воркеров gunicorn.
+
+Для каждого числа воркеров запускается gunicorn -c gunicorn.conf.py и на него
+подаётся одинаковая нагрузка из loadtest (по умолчанию scenarios/scaling.jsonl:
+вход с bcrypt и чтения). Все прогоны идут против одной заранее заполненной БД.
+По умолчанию это временный SQLite, для PostgreSQL нужен --db-url. Несколько
+воркеров gunicorn запускает только с общими хранилищами в Redis (--redis-url).
+
+    python -m benchmarks.scaling --workers 1,2,4 --concurrency 32 --iterations 5 --redis-url redis://localhost:6379/0
+
+Прирост виден только при наличии свободных ядер: число воркеров больше
+os.cpu_count() ничего не добавит.
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+from benchmarks import loadtest
+
+SCALING_SCRIPT = Path(__file__).parent / "scenarios" / "scaling.jsonl"
+
+
+async def prepare(concurrency: int) -> None:
+    from app.api.permissions import permission_registry
+    from app.core.db import AsyncSessionLocal, dispose_async_engine
+
+    await loadtest.create_schema()
+    async with AsyncSessionLocal() as db:
+        await permission_registry.seed(db)
+    await loadtest.seed_users(concurrency)
+    await dispose_async_engine()
+
+
+def wait_ready(base_url: str, process: subprocess.Popen, timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("gunicorn exited during startup")
+        try:
+            if httpx.get(f"{base_url}/.well-known/jwks.json", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("gunicorn did not start in time")
+
+
+def run_with_workers(workers: int, args: argparse.Namespace) -> dict:
+    base_url = f"http://127.0.0.1:{args.port}"
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers), BIND=f"127.0.0.1:{args.port}", ACCESS_LOG="")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "app.main:app"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_ready(base_url, process)
+        load_args = argparse.Namespace(
+            base_url=base_url, script=args.script, concurrency=args.concurrency,
+            iterations=args.iterations, user_prefix=f"bench-{loadtest.RUN_ID}-",
+        )
+        return asyncio.run(loadtest.run(load_args))
+    finally:
+        # SIGTERM: gunicorn дожидается текущих запросов и останавливает воркеры
+        process.terminate()
+        process.wait(timeout=60)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default=None, help="Список через запятую, по умолчанию 1, 2, 4 ... до числа ядер")
+    parser.add_argument("--db-url", help="БД для прогона (по умолчанию временный файл SQLite)")
+    parser.add_argument("--script", default=str(SCALING_SCRIPT))
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8790)
+    parser.add_argument("--redis-url", help="Redis для токенов, лимитов и идемпотентности (нужен для >1 воркера)")
+    args = parser.parse_args()
+
+    if args.workers:
+        counts = [int(value) for value in args.workers.split(",")]
+    else:
+        counts = [1]
+        while counts[-1] * 2 <= (os.cpu_count() or 1):
+            counts.append(counts[-1] * 2)
+    if args.redis_url:
+        for name in ("TOKEN_STORE", "RATE_LIMIT_BACKEND", "IDEMPOTENCY_BACKEND"):
+            os.environ[name] = "redis"
+        os.environ["REDIS_URL"] = args.redis_url
+    elif max(counts) > 1:
+        parser.error("--redis-url is required for more than one worker: gunicorn refuses memory stores")
+
+    loadtest.configure_environment(
+        args.db_url or f"sqlite+aiosqlite:///{tempfile.mkdtemp(prefix='auth-scaling-')}/bench.db"
+    )
+    # Провайдер OpenID не нужен: адрес недоступен, предзагрузка сразу завершается ошибкой
+    os.environ.setdefault("GOOGLE_DISCOVERY_URL", "http://127.0.0.1:9/.well-known/openid-configuration")
+    asyncio.run(prepare(args.concurrency))
+
+    results = []
+    for workers in counts:
+        report = run_with_workers(workers, args)
+        errors = sum(item["errors"] for name, item in report.items() if not name.startswith("_"))
+        results.append((workers, report["_total"]["rps"], report.get("login", {}).get("p95_ms"), errors))
+
+    base_rps = results[0][1]
+    print(f"cpus: {os.cpu_count()}")
+    print(f"{'workers':>7} {'req/s':>8} {'speedup':>8} {'login p95 ms':>13} {'errors':>7}")
+    for workers, rps, login_p95, errors in results:
+        print(f"{workers:>7} {rps:>8} {rps / base_rps:>7.2f}x {login_p95 or '-':>13} {errors:>7}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+"""Время холодного старта приложения.
+
+Каждый замер идёт в новом интерпретаторе: импорт app.main (вместе с create_app)
+и запуск lifespan до готовности принимать запросы (движок БД, карта прав,
+фильтр отзыва, метаданные OpenID). БД — временный SQLite, вместо Google —
+локальная заглушка, поэтому сеть не нужна. Запуск самого интерпретатора
+в замер не входит.
+
+    python -m benchmarks.startup --runs 5 --target-ms 1500
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+
+def child() -> None:
+    from benchmarks.loadtest import configure_environment
+
+    configure_environment(f"sqlite+aiosqlite:///{tempfile.mkdtemp(prefix='auth-startup-')}/startup.db")
+    started = time.perf_counter()
+    from app.main import app
+
+    imported = time.perf_counter()
+
+    async def start() -> float:
+        from app.api.google_auth import get_google_client
+        from benchmarks.loadtest import create_schema
+        from benchmarks.oidc_stub import OIDCStub
+
+        # Ключ заглушки и схема БД готовятся вне замера; клиент OAuth создаётся в замере
+        stub = OIDCStub()
+        client_started = time.perf_counter()
+        stub.install(get_google_client())
+        client_ready = time.perf_counter()
+        await create_schema()
+        lifespan_started = time.perf_counter()
+        lifespan = app.router.lifespan_context(app)
+        await lifespan.__aenter__()
+        ready = time.perf_counter()
+        await lifespan.__aexit__(None, None, None)
+        return (client_ready - client_started) + (ready - lifespan_started)
+
+    lifespan = asyncio.run(start())
+    print(json.dumps({
+        "import_ms": (imported - started) * 1000,
+        "lifespan_ms": lifespan * 1000,
+        "total_ms": (imported - started + lifespan) * 1000,
+    }))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--target-ms", type=float, help="Завершиться с кодом 1, если медиана total выше")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child()
+        return 0
+
+    samples = []
+    for _ in range(args.runs):
+        result = subprocess.run(
+            [sys.executable, "-m", "benchmarks.startup", "--child"],
+            capture_output=True, text=True, check=True, env=os.environ.copy(),
+        )
+        samples.append(json.loads(result.stdout.strip().splitlines()[-1]))
+
+    print(f"{'phase':<12} {'median ms':>10} {'max ms':>10}")
+    for phase in ("import_ms", "lifespan_ms", "total_ms"):
+        values = [sample[phase] for sample in samples]
+        print(f"{phase[:-3]:<12} {statistics.median(values):>10.1f} {max(values):>10.1f}")
+
+    total = statistics.median(sample["total_ms"] for sample in samples)
+    if args.target_ms and total > args.target_ms:
+        print(f"Startup {total:.0f} ms exceeds target {args.target_ms:.0f} ms", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
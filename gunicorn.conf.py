@@ -0,0 +1,72 @@
+# Продакшен-запуск: gunicorn -c gunicorn.conf.py app.main:app
+#
+# Каждый воркер — отдельный процесс с uvicorn и своим event loop. Приложение
+# загружается в воркере после fork (preload_app выключен), а движок БД, пулы
+# и фоновые задачи создаются в lifespan, поэтому соединения не наследуются
+# от мастер-процесса. По SIGTERM воркер перестаёт принимать соединения,
+# дожидается текущих запросов (graceful_timeout) и в lifespan закрывает пулы.
+import glob
+import multiprocessing
+import os
+import tempfile
+
+# Состояние, которое воркеры делят только через Redis. С memory у каждого процесса
+# свои refresh-токены (обновление в другом воркере сочтёт токен повторным и отзовёт
+# сессию), свои лимиты частоты и свои ключи идемпотентности.
+SHARED_STATE_SETTINGS = ("TOKEN_STORE", "RATE_LIMIT_BACKEND", "IDEMPOTENCY_BACKEND")
+
+
+def memory_stores() -> list[str]:
+    from app.core.config import settings
+
+    return [name for name in SHARED_STATE_SETTINGS if getattr(settings, name) == "memory"]
+
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+# Хэширование паролей нагружает CPU, поэтому по умолчанию один воркер на ядро,
+# но только если всё общее состояние в Redis; иначе один воркер
+workers = int(os.getenv("WEB_CONCURRENCY") or (1 if memory_stores() else multiprocessing.cpu_count()))
+worker_class = "uvicorn_worker.UvicornWorker"
+preload_app = False
+
+# Сколько ждать завершения текущих запросов при остановке, с
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", 30))
+timeout = int(os.getenv("WORKER_TIMEOUT", 60))
+keepalive = int(os.getenv("KEEPALIVE", 5))
+
+accesslog = os.getenv("ACCESS_LOG", "-") or None
+errorlog = "-"
+loglevel = os.getenv("LOG_LEVEL", "info")
+
+# Метрики воркеров пишутся в файлы этого каталога, /metrics собирает их все
+# (multiprocess-режим prometheus_client). Воркеры наследуют переменную при fork,
+# до импорта prometheus_client
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "auth-service-metrics"))
+
+
+def on_starting(server):
+    stores = memory_stores()
+    if server.cfg.workers > 1 and stores:
+        raise RuntimeError(
+            f"{', '.join(name + '=memory' for name in stores)} with {server.cfg.workers} workers: "
+            "state would not be shared between workers; set these to redis or WEB_CONCURRENCY=1"
+        )
+    # Один воркер на многоядерной машине выбран из-за memory-хранилищ, а не оператором
+    if stores and not os.getenv("WEB_CONCURRENCY") and multiprocessing.cpu_count() > 1:
+        server.log.warning(
+            "Running a single worker on %s CPUs because %s: set these to redis to start a worker per CPU",
+            multiprocessing.cpu_count(), ", ".join(name + "=memory" for name in stores),
+        )
+
+    # Файлы прошлого запуска исказили бы счётчики
+    metrics_dir = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    os.makedirs(metrics_dir, exist_ok=True)
+    for path in glob.glob(os.path.join(metrics_dir, "*.db")):
+        os.remove(path)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    # Gauge остановленного воркера больше не входят в сумму по живым процессам
+    multiprocess.mark_process_dead(worker.pid)
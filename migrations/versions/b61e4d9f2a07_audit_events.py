@@ -0,0 +1,38 @@
+"""audit events
+
+Revision ID: b61e4d9f2a07
+Revises: 5e8d0a3b1c72
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b61e4d9f2a07'
+down_revision: Union[str, None] = '5e8d0a3b1c72'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'audit_events',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('event', sa.String(length=50), nullable=False),
+        sa.Column('ip', sa.String(length=45), nullable=True),
+        sa.Column('data', sa.JSON(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_audit_events_user_id_id', 'audit_events', ['user_id', 'id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_audit_events_user_id_id', table_name='audit_events')
+    op.drop_table('audit_events')
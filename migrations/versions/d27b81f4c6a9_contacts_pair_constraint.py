@@ -0,0 +1,44 @@
+"""contacts pair constraint
+
+Revision ID: d27b81f4c6a9
+Revises: 9c3e5b7a2f41
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd27b81f4c6a9'
+down_revision: Union[str, None] = '9c3e5b7a2f41'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Убираем дубликаты пар, оставляя самую раннюю запись
+    op.execute(
+        "DELETE FROM contacts c USING contacts d "
+        "WHERE c.user_id = d.user_id AND c.contact_id = d.contact_id AND c.id > d.id"
+    )
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS uq_contacts_user_contact "
+            "ON contacts (user_id, contact_id)"
+        )
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_contacts_contact_confirmed "
+            "ON contacts (contact_id, confirmed)"
+        )
+    op.execute(
+        "ALTER TABLE contacts ADD CONSTRAINT uq_contacts_user_contact "
+        "UNIQUE USING INDEX uq_contacts_user_contact"
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint('uq_contacts_user_contact', 'contacts', type_='unique')
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_contacts_contact_confirmed")
@@ -0,0 +1,30 @@
+"""contacts graph index
+
+Revision ID: e3a9c5d17b48
+Revises: b61e4d9f2a07
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e3a9c5d17b48'
+down_revision: Union[str, None] = 'b61e4d9f2a07'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_contacts_user_confirmed_contact "
+            "ON contacts (user_id, confirmed, contact_id)"
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_contacts_user_confirmed_contact")
@@ -0,0 +1,27 @@
+"""users data version
+
+Revision ID: f42b8e6a0c93
+Revises: e3a9c5d17b48
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f42b8e6a0c93'
+down_revision: Union[str, None] = 'e3a9c5d17b48'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Константа по умолчанию: в PostgreSQL 11+ колонка добавляется без перезаписи таблицы
+    op.add_column('users', sa.Column('data_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('users', 'data_version')
@@ -0,0 +1,98 @@
+"""Общие настройки тестов: окружение приложения, временная SQLite и приложение в процессе.
+
+Настройки читаются при импорте app, поэтому окружение задаётся здесь, до импорта
+приложения. База одна на весь прогон, поэтому тесты создают пользователей
+с уникальными именами.
+"""
+import os
+import secrets
+import tempfile
+
+import httpx
+import pytest
+
+DATA_DIR = tempfile.mkdtemp(prefix="auth-tests-")
+
+for name, value in {
+    "POSTGRES_SERVER": "localhost",
+    "POSTGRES_USER": "test",
+    "SECRET_KEY": "test-secret",
+    "ALGORITHM": "HS256",
+    "ACCESS_TOKEN_EXPIRE_MINUTES": "15",
+    "GOOGLE_CLIENT_ID": "test",
+    "GOOGLE_CLIENT_SECRET": "test",
+    # Все тестовые клиенты приходят с одного адреса
+    "RATE_LIMIT_ENABLED": "false",
+    "BCRYPT_ROUNDS": "4",
+}.items():
+    os.environ.setdefault(name, value)
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{DATA_DIR}/primary.db"
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture(scope="session", autouse=True)
+def schema():
+    from app.api.models import Base
+    from app.core.db import DATABASE_URL, create_sync_engine
+
+    engine = create_sync_engine(DATABASE_URL)
+    Base.metadata.create_all(engine)
+    engine.dispose()
+
+
+@pytest.fixture
+def oidc_stub():
+    """Заглушка Google: authlib ходит в неё без сети, метаданные клиента сбрасываются."""
+    from app.api.google_auth import get_google_client
+    from benchmarks.oidc_stub import OIDCStub
+
+    client = get_google_client()
+    client.server_metadata.clear()
+    stub = OIDCStub()
+    stub.install(client)
+    return stub
+
+
+@pytest.fixture
+async def app(oidc_stub):
+    from app.main import create_app
+
+    app = create_app()
+    async with app.router.lifespan_context(app):
+        yield app
+
+
+def make_client(app) -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://testserver")
+
+
+@pytest.fixture
+async def client(app):
+    async with make_client(app) as client:
+        yield client
+
+
+@pytest.fixture
+async def signed_in(app):
+    """Фабрика клиентов: регистрирует пользователя и входит им; возвращает (имя, клиент)."""
+    clients = []
+
+    async def sign_in(prefix: str = "user") -> tuple[str, httpx.AsyncClient]:
+        username = f"{prefix}-{secrets.token_hex(4)}"
+        client = make_client(app)
+        clients.append(client)
+        response = await client.post(
+            "/register", data={"username": username, "email": f"{username}@example.com", "password": "secret"},
+        )
+        assert response.status_code == 303, response.text
+        response = await client.post("/login", data={"username": username, "password": "secret"})
+        assert response.status_code == 200, response.text
+        return username, client
+
+    yield sign_in
+    for client in clients:
+        await client.aclose()
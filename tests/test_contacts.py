@@ -0,0 +1,66 @@
+import asyncio
+import json
+
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+async def contact_rows(client) -> dict[str, bool]:
+    response = await client.get("/user-info/contacts")
+    assert response.status_code == 200, response.text
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    return {row["username"]: bool(row["confirmed"]) for row in rows}
+
+
+# SQLite выполняет транзакции записи по очереди; на PostgreSQL тот же порядок
+# задают блокировки строк пользователей в _lock_pair
+async def test_mutual_add_is_confirmed_when_requests_race(signed_in):
+    for _ in range(5):
+        alice, alice_client = await signed_in("alice")
+        bob, bob_client = await signed_in("bob")
+
+        responses = await asyncio.gather(
+            alice_client.post("/add-contact", json={"contact_username": bob}),
+            bob_client.post("/add-contact", json={"contact_username": alice}),
+        )
+
+        assert [response.status_code for response in responses] == [200, 200]
+        assert await contact_rows(alice_client) == {bob: True}
+        assert await contact_rows(bob_client) == {alice: True}
+
+
+async def test_batch_add_and_remove_report_status_per_name(signed_in):
+    alice, alice_client = await signed_in("alice")
+    bob, bob_client = await signed_in("bob")
+    carol, _ = await signed_in("carol")
+    dave, _ = await signed_in("dave")
+    eve, _ = await signed_in("eve")
+    await bob_client.post("/add-contact", json={"contact_username": alice})
+    await alice_client.post("/add-contact", json={"contact_username": dave})
+
+    response = await alice_client.post(
+        "/add-contacts", json={"contact_usernames": [bob, carol, carol, dave, alice, "missing-user"]},
+    )
+
+    assert response.status_code == 200, response.text
+    assert response.json()["results"] == [
+        {"username": bob, "status": "confirmed"},
+        {"username": carol, "status": "pending"},
+        {"username": dave, "status": "exists"},
+        {"username": alice, "status": "self"},
+        {"username": "missing-user", "status": "user_not_found"},
+    ]
+    assert await contact_rows(alice_client) == {bob: True, carol: False, dave: False}
+
+    response = await alice_client.post("/remove-contacts", json={"contact_usernames": [bob, carol, eve, "missing-user"]})
+
+    assert response.status_code == 200, response.text
+    assert response.json()["results"] == [
+        {"username": bob, "status": "removed"},
+        {"username": carol, "status": "removed"},
+        {"username": eve, "status": "not_found"},
+        {"username": "missing-user", "status": "user_not_found"},
+    ]
+    assert await contact_rows(alice_client) == {dave: False}
+    assert await contact_rows(bob_client) == {}
@@ -0,0 +1,31 @@
+import httpx
+import pytest
+
+from app.core.security import decode_access_token
+
+pytestmark = pytest.mark.anyio
+
+
+async def sign_in_with_google(client: httpx.AsyncClient, stub, email: str) -> httpx.Response:
+    response = await client.get("/auth/google")
+    assert response.status_code == 302
+    # Браузер уходит к провайдеру и возвращается на callback с кодом и state
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=stub.app), base_url=stub.origin) as provider:
+        authorize = await provider.get(httpx.URL(response.headers["location"]).copy_add_param("login_hint", email))
+    assert authorize.status_code == 302
+    callback = httpx.URL(authorize.headers["location"])
+    return await client.get(callback.path, params=callback.params)
+
+
+async def test_callback_uses_prefetched_metadata_and_keys(client, oidc_stub):
+    # Discovery-документ и JWKS загружены при старте
+    assert oidc_stub.calls == {"discovery": 1, "jwks": 1}
+
+    for email in ("first@example.com", "second@example.com"):
+        response = await sign_in_with_google(client, oidc_stub, email)
+        assert response.status_code == 302, response.text
+        payload = decode_access_token(response.cookies["access_token"])
+        assert payload["role"] == "default"
+
+    # Callback только меняет код на токен; ID-токен проверен по ключам в памяти
+    assert oidc_stub.calls == {"discovery": 1, "jwks": 1, "token": 2}
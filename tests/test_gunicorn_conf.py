@@ -0,0 +1,68 @@
+import runpy
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+from app.core.config import settings
+
+CONFIG = str(Path(__file__).parent.parent / "gunicorn.conf.py")
+SHARED_STATE = ("TOKEN_STORE", "RATE_LIMIT_BACKEND", "IDEMPOTENCY_BACKEND")
+
+
+@pytest.fixture
+def load_config(tmp_path, monkeypatch):
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path / "metrics"))
+    monkeypatch.delenv("WEB_CONCURRENCY", raising=False)
+    return lambda: runpy.run_path(CONFIG)
+
+
+def use_redis(monkeypatch, *names):
+    for name in names:
+        monkeypatch.setattr(settings, name, "redis")
+
+
+def test_single_worker_by_default_with_memory_stores(load_config, monkeypatch):
+    use_redis(monkeypatch, "TOKEN_STORE", "RATE_LIMIT_BACKEND")
+
+    assert load_config()["workers"] == 1
+
+
+def test_worker_per_cpu_when_state_is_in_redis(load_config, monkeypatch):
+    use_redis(monkeypatch, *SHARED_STATE)
+    monkeypatch.setattr("multiprocessing.cpu_count", lambda: 4)
+
+    assert load_config()["workers"] == 4
+
+
+def test_refuses_several_workers_with_memory_store(load_config, monkeypatch):
+    use_redis(monkeypatch, "TOKEN_STORE", "RATE_LIMIT_BACKEND")
+    config = load_config()
+
+    with pytest.raises(RuntimeError, match="IDEMPOTENCY_BACKEND=memory"):
+        config["on_starting"](SimpleNamespace(cfg=SimpleNamespace(workers=2)))
+
+
+def test_starting_clears_stale_metric_files(load_config, monkeypatch, tmp_path):
+    use_redis(monkeypatch, *SHARED_STATE)
+    stale = tmp_path / "metrics" / "counter_123.db"
+    stale.parent.mkdir()
+    stale.write_bytes(b"")
+    config = load_config()
+
+    config["on_starting"](SimpleNamespace(cfg=SimpleNamespace(workers=2)))
+
+    assert not stale.exists()
+
+
+def test_warns_when_memory_stores_keep_a_single_worker(load_config, monkeypatch):
+    use_redis(monkeypatch, "TOKEN_STORE", "RATE_LIMIT_BACKEND")
+    monkeypatch.setattr("multiprocessing.cpu_count", lambda: 4)
+    config = load_config()
+    warnings = []
+    log = SimpleNamespace(warning=lambda message, *args: warnings.append(message % args))
+
+    config["on_starting"](SimpleNamespace(cfg=SimpleNamespace(workers=config["workers"]), log=log))
+
+    assert config["workers"] == 1
+    assert warnings and "IDEMPOTENCY_BACKEND=memory" in warnings[0]
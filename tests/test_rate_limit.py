@@ -0,0 +1,43 @@
+import asyncio
+
+import pytest
+from fakeredis import FakeAsyncRedis
+
+from app.core.rate_limit import RedisRateLimiter
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def limiter():
+    limiter = RedisRateLimiter(FakeAsyncRedis(decode_responses=True))
+    yield limiter
+    await limiter.close()
+
+
+async def test_redis_limiter_allows_up_to_limit(limiter):
+    results = [await limiter.hit("login:ip", limit=3, window=60) for _ in range(4)]
+
+    assert results[:3] == [0, 0, 0]
+    assert 59 < results[3] <= 60
+
+
+async def test_redis_limiter_does_not_record_rejected_hits(limiter):
+    for _ in range(5):
+        await limiter.hit("login:ip", limit=2, window=60)
+
+    assert await limiter._redis.zcard("ratelimit:login:ip") == 2
+
+
+async def test_redis_limiter_is_atomic_under_concurrency(limiter):
+    results = await asyncio.gather(*(limiter.hit("register:ip", limit=5, window=60) for _ in range(50)))
+
+    assert sum(1 for wait in results if wait == 0) == 5
+
+
+async def test_redis_limiter_window_slides(limiter):
+    await limiter.hit("login:user", limit=1, window=1)
+    assert await limiter.hit("login:user", limit=1, window=1) > 0
+
+    await asyncio.sleep(1.1)
+    assert await limiter.hit("login:user", limit=1, window=1) == 0
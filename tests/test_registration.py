@@ -0,0 +1,48 @@
+import secrets
+
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+def form(username: str, email: str | None = None) -> dict:
+    return {"username": username, "email": email or f"{username}@example.com", "password": "secret"}
+
+
+async def test_taken_username_and_email_return_409(client):
+    username = f"taken-{secrets.token_hex(4)}"
+    assert (await client.post("/register", data=form(username))).status_code == 303
+
+    response = await client.post("/register", data=form(username, email=f"other-{username}@example.com"))
+    assert response.status_code == 409
+    assert response.json() == {"detail": "Username already registered"}
+
+    response = await client.post("/register", data=form(f"other-{username}", email=f"{username}@example.com"))
+    assert response.status_code == 409
+    assert response.json() == {"detail": "Email already registered"}
+
+
+async def test_retry_with_idempotency_key_replays_result(client):
+    username = f"retry-{secrets.token_hex(4)}"
+    headers = {"Idempotency-Key": secrets.token_hex(8)}
+
+    first = await client.post("/register", data=form(username), headers=headers)
+    retry = await client.post("/register", data=form(username), headers=headers)
+
+    assert first.status_code == 303
+    assert "Idempotent-Replayed" not in first.headers
+    # Повтор получает тот же ответ, а не 409 на только что созданное имя
+    assert retry.status_code == 303
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    login = await client.post("/login", data={"username": username, "password": "secret"})
+    assert login.status_code == 200
+
+
+async def test_idempotency_key_reused_with_other_parameters_is_rejected(client):
+    headers = {"Idempotency-Key": secrets.token_hex(8)}
+    first = await client.post("/register", data=form(f"first-{secrets.token_hex(4)}"), headers=headers)
+    assert first.status_code == 303
+
+    response = await client.post("/register", data=form(f"second-{secrets.token_hex(4)}"), headers=headers)
+
+    assert response.status_code == 422
@@ -0,0 +1,41 @@
+import pytest
+
+from app.api.deps import READ_PRIMARY_COOKIE
+from app.api.models import Base
+from app.core.config import settings
+from app.core.db import create_sync_engine
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture(autouse=True)
+def replica(tmp_path, monkeypatch):
+    """Отдельный файл SQLite в роли реплики: схема есть, данные основной БД в неё не попадают."""
+    url = f"sqlite+aiosqlite:///{tmp_path}/replica.db"
+    engine = create_sync_engine(url)
+    Base.metadata.create_all(engine)
+    engine.dispose()
+    monkeypatch.setattr(settings, "REPLICA_DATABASE_URLS", url)
+
+
+async def contacts(client) -> str:
+    response = await client.get("/user-info/contacts")
+    assert response.status_code == 200, response.text
+    return response.text
+
+
+async def test_reads_follow_read_primary_cookie(signed_in):
+    _, alice_client = await signed_in("alice")
+    bob, _ = await signed_in("bob")
+    # После регистрации клиент читает из основной БД: на реплике его ещё нет
+    assert alice_client.cookies.get(READ_PRIMARY_COOKIE)
+    assert await contacts(alice_client) == ""
+
+    response = await alice_client.post("/add-contact", json={"contact_username": bob})
+    assert response.status_code == 200, response.text
+    assert READ_PRIMARY_COOKIE in response.cookies
+    assert bob in await contacts(alice_client)
+
+    # Кука истекла: чтение уходит в отстающую реплику, где контакта нет
+    alice_client.cookies.delete(READ_PRIMARY_COOKIE)
+    assert await contacts(alice_client) == ""
@@ -0,0 +1,79 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fakeredis import FakeAsyncRedis, FakeServer
+
+from app.core import token_store as tokens
+from app.core.security import create_access_token, decode_access_token, key_ring
+from app.core.token_store import RedisTokenStore, RevocationChecker
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def server():
+    return FakeServer()
+
+
+@pytest.fixture
+async def store(server, monkeypatch):
+    store = RedisTokenStore(FakeAsyncRedis(server=server, decode_responses=True))
+    checker = RevocationChecker(store, sync_seconds=60, cache_size=100)
+    monkeypatch.setattr(tokens, "token_store", store)
+    monkeypatch.setattr(tokens, "revocation_checker", checker)
+    yield store
+    await store.close()
+
+
+async def test_rotation_issues_new_token_in_same_family(store):
+    token, family = await tokens.issue_refresh_token("alice")
+
+    subject, new_token, new_family = await tokens.rotate_refresh_token(token)
+
+    assert (subject, new_family) == ("alice", family)
+    assert new_token != token
+    assert await tokens.rotate_refresh_token(new_token) is not None
+
+
+async def test_reused_refresh_token_revokes_family(store):
+    token, _ = await tokens.issue_refresh_token("alice")
+    _, current, _ = await tokens.rotate_refresh_token(token)
+
+    # Старый токен предъявлен повторно: цепочка отзывается вместе с действующим токеном
+    assert await tokens.rotate_refresh_token(token) is None
+    assert await tokens.rotate_refresh_token(current) is None
+
+
+async def test_logout_revokes_access_token_and_family(store):
+    refresh, family = await tokens.issue_refresh_token("alice")
+    access = decode_access_token(create_access_token(data={"sub": "alice", "fam": family}))
+
+    await tokens.revoke_session(access)
+
+    assert await tokens.revocation_checker.is_revoked(access["jti"])
+    assert await store.is_revoked(access["jti"])
+    assert await tokens.rotate_refresh_token(refresh) is None
+
+
+async def test_revocation_reaches_other_workers_after_sync(server, store):
+    other_worker = RevocationChecker(
+        RedisTokenStore(FakeAsyncRedis(server=server, decode_responses=True)), sync_seconds=60, cache_size=100,
+    )
+    await other_worker.sync()
+
+    await tokens.revocation_checker.revoke("leaked-jti", ttl=60)
+
+    # До синхронизации bloom-фильтр другого воркера о токене не знает
+    assert not await other_worker.is_revoked("leaked-jti")
+    await other_worker.sync()
+    assert await other_worker.is_revoked("leaked-jti")
+    assert not await other_worker.is_revoked("valid-jti")
+
+
+async def test_access_token_without_jti_is_rejected(client):
+    # Подписан действующим ключом, но в обход create_access_token: отозвать его через /logout нельзя
+    token = key_ring.sign({"sub": "alice", "exp": datetime.utcnow() + timedelta(minutes=5)})
+
+    response = await client.get("/user-info", cookies={"access_token": token})
+
+    assert response.status_code == 401